@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能基准测试
+
+在固定的合成数据上运行区域文件分析（MCRegionAnalyzer）、方块提取（MCBlockExtractor）
+和方块信息日志解析（parse_blocks_info_log），记录每个阶段的吞吐量和峰值内存，
+与保存的基准结果比较：吞吐量下降或峰值内存增长超过阈值时按阶段列出差异并返回失败，
+在改动进入生产存档扫描之前发现性能退化。
+
+合成数据由固定的随机种子生成，相同参数每次生成的区域文件和日志内容都相同。
+吞吐量取多次运行（至少MIN_REPEAT次）的中位数，并记录各次之间的波动；
+峰值内存使用tracemalloc在单独的一次运行中测量，不影响计时。
+"""
+
+import os
+import gc
+import sys
+import time
+import json
+import zlib
+import hashlib
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+
+import numpy as np
+import amulet_nbt as nbt
+
+from mc_progress import format_bytes
+from mc_chunk_filter import ChunkFilter
+from mc_region_reader import SECTOR_SIZE, COMPRESSION_ZLIB, read_region_entries
+from mc_region_writer import write_region_file
+from mc_report_writer import write_json
+
+# 基准文件格式版本，结构变化时递增以使旧基准失效
+BENCHMARK_VERSION = 2
+
+# 合成数据的默认规模和随机种子
+DEFAULT_REGIONS = 2
+DEFAULT_CHUNKS_PER_REGION = 256
+DEFAULT_LOG_BLOCKS = 2000
+FIXTURE_SEED = 20250327
+
+# 默认阈值（百分比）
+DEFAULT_MAX_SLOWDOWN = 15.0
+DEFAULT_MAX_MEMORY_GROWTH = 20.0
+
+# 每个阶段最少的计时次数，单次计时的波动可能超过吞吐量阈值
+MIN_REPEAT = 3
+
+# 每个区块的区段数，第0个区段在所有区块中相同，用于覆盖区段去重路径
+FIXTURE_SECTIONS = 4
+
+# 其余区段中空气的比例，以及非空气方块的ID（包含需要Add数组的模组方块ID）
+FIXTURE_AIR_RATIO = 0.75
+FIXTURE_BLOCK_PALETTE = np.array([1, 1, 2, 3, 4, 17, 54, 61, 300, 1024], dtype=np.int64)
+
+# 方块提取逐个方块解码，比区块分析慢得多，只提取第一个区域文件中这个范围内的区块
+EXTRACT_CHUNK_BOX = (0, 0, 3, 1)
+
+STAGES = ("analyze", "extract", "parse-log")
+
+
+def _byte_array(values):
+    """把0-255的numpy数组转换为NBT字节数组"""
+    return nbt.ByteArrayTag(values.astype(np.uint8).view(np.int8))
+
+
+def _pack_nibbles(values):
+    """把每个方块一个的4位值打包为半字节数组（偶数下标在低4位）"""
+    values = values & 0x0F
+    return values[0::2] | (values[1::2] << 4)
+
+
+def build_fixture_chunk(chunk_x, chunk_z, rng):
+    """生成一个1.7.10格式的合成区块，返回未压缩的NBT数据"""
+    sections = []
+    for section_y in range(FIXTURE_SECTIONS):
+        if section_y == 0:
+            block_ids = np.ones(4096, dtype=np.int64)
+        else:
+            block_ids = np.where(rng.random_sample(4096) < FIXTURE_AIR_RATIO, 0,
+                                 rng.choice(FIXTURE_BLOCK_PALETTE, 4096))
+        section = {
+            "Y": nbt.ByteTag(section_y),
+            "Blocks": _byte_array(block_ids & 0xFF),
+            "Data": _byte_array(_pack_nibbles(rng.randint(0, 16, 4096) if section_y else np.zeros(4096, np.int64)))
+        }
+        if (block_ids > 0xFF).any():
+            section["Add"] = _byte_array(_pack_nibbles(block_ids >> 8))
+        sections.append(nbt.CompoundTag(section))
+
+    entities = []
+    for i in range(rng.randint(0, 4)):
+        entities.append(nbt.CompoundTag({
+            "id": nbt.StringTag("Pig"),
+            "Pos": nbt.ListTag([nbt.DoubleTag(chunk_x * 16 + i + 0.5), nbt.DoubleTag(64.0),
+                                nbt.DoubleTag(chunk_z * 16 + 0.5)]),
+            "UUIDMost": nbt.LongTag(chunk_x * 100000 + chunk_z),
+            "UUIDLeast": nbt.LongTag(i)
+        }))
+
+    tile_entities = []
+    if (chunk_x + chunk_z) % 2 == 0:
+        items = [nbt.CompoundTag({"id": nbt.ShortTag(int(item_id)), "Count": nbt.ByteTag(1), "Slot": nbt.ByteTag(slot)})
+                 for slot, item_id in enumerate(rng.randint(1, 400, 8))]
+        tile_entities.append(nbt.CompoundTag({
+            "id": nbt.StringTag("Chest"),
+            "x": nbt.IntTag(chunk_x * 16), "y": nbt.IntTag(64), "z": nbt.IntTag(chunk_z * 16),
+            "Items": nbt.ListTag(items)
+        }))
+
+    level = nbt.CompoundTag({
+        "xPos": nbt.IntTag(chunk_x),
+        "zPos": nbt.IntTag(chunk_z),
+        "InhabitedTime": nbt.LongTag(int(rng.randint(0, 100000))),
+        "Entities": nbt.ListTag(entities, 10),
+        "TileEntities": nbt.ListTag(tile_entities, 10),
+        "Sections": nbt.ListTag(sections)
+    })
+    return nbt.NamedTag(nbt.CompoundTag({"Level": level})).to_nbt(compressed=False)
+
+
+def build_fixture_log(block_count, rng):
+    """生成合成的方块信息日志，三种纹理类型都有"""
+    lines = []
+    for block_id in range(block_count):
+        lines.append(f"[12:00:00] 方块ID: {block_id}, 注册名称: benchmark:block_{block_id}, "
+                     f"未本地化名称: tile.block_{block_id}")
+        kind = rng.randint(0, 3)
+        for face in range(6):
+            if kind == 0:
+                lines.append(f"面 {face} 纹理为null")
+            elif kind == 1:
+                lines.append(f"面 {face} 纹理: texture_{block_id}")
+            else:
+                lines.append(f"面 {face} 纹理: texture_{block_id}_{face % 3}")
+        conclusion = ("方块所有面均为null，可能使用完全自定义渲染", "方块使用相同纹理，标准方块",
+                      "不同面使用不同纹理，定向方块")[kind]
+        lines.append(f"结论: {conclusion}")
+    return "\n".join(lines) + "\n"
+
+
+class MCBenchmark:
+    """
+    性能基准测试
+    生成合成数据，运行各阶段并与基准结果比较
+    """
+
+    def __init__(self, regions=DEFAULT_REGIONS, chunks_per_region=DEFAULT_CHUNKS_PER_REGION,
+                 log_blocks=DEFAULT_LOG_BLOCKS, repeat=3, fixture_dir=None):
+        """
+        fixture_dir为None时合成数据生成在临时目录中，运行结束后删除；
+        repeat小于MIN_REPEAT时按MIN_REPEAT次计时
+        """
+        self.regions = regions
+        self.chunks_per_region = min(chunks_per_region, 1024)
+        self.log_blocks = log_blocks
+        self.repeat = max(repeat, MIN_REPEAT)
+        self.fixture_dir = fixture_dir
+
+        self.region_files = []
+        self.log_file = None
+        self.fixture_digest = None
+        self.results = {}
+        self.extract_filter = ChunkFilter(chunk_box=EXTRACT_CHUNK_BOX)
+
+    def fixture_params(self):
+        """合成数据的参数，与基准中记录的参数不同时结果不可比较"""
+        return {
+            "regions": self.regions,
+            "chunks_per_region": self.chunks_per_region,
+            "log_blocks": self.log_blocks,
+            "extract_chunk_box": list(EXTRACT_CHUNK_BOX),
+            "seed": FIXTURE_SEED
+        }
+
+    def generate_fixtures(self, fixture_dir):
+        """在fixture_dir中生成合成的区域文件和方块信息日志"""
+        rng = np.random.RandomState(FIXTURE_SEED)
+        region_dir = os.path.join(fixture_dir, "region")
+        os.makedirs(region_dir, exist_ok=True)
+        digest = hashlib.sha256()
+
+        self.region_files = []
+        for region_index in range(self.regions):
+            region_x, region_z = region_index, 0
+            chunks = []
+            for chunk_index in range(self.chunks_per_region):
+                chunk_x = region_x * 32 + chunk_index % 32
+                chunk_z = region_z * 32 + chunk_index // 32
+                raw = build_fixture_chunk(chunk_x, chunk_z, rng)
+                chunks.append((chunk_index, 1700000000 + chunk_index, COMPRESSION_ZLIB, zlib.compress(raw)))
+
+            path = os.path.join(region_dir, f"r.{region_x}.{region_z}.mca")
+            write_region_file(path, chunks)
+            self.region_files.append(path)
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+
+        self.log_file = os.path.join(fixture_dir, "blocks_info.log")
+        log_text = build_fixture_log(self.log_blocks, rng)
+        with open(self.log_file, 'w', encoding='utf-8') as f:
+            f.write(log_text)
+        digest.update(log_text.encode("utf-8"))
+
+        self.fixture_digest = digest.hexdigest()
+
+    def _run_analyze(self):
+        from mc_save_analyzer import MCRegionAnalyzer
+        chunks = 0
+        for path in self.region_files:
+            analyzer = MCRegionAnalyzer(path)
+            if not analyzer.read_mca_file():
+                return None
+            chunks += analyzer.analyzed_chunks
+        return chunks
+
+    def _run_extract(self):
+        from mc_block_extractor import MCBlockExtractor
+        chunks = 0
+        for path in self.region_files:
+            extractor = MCBlockExtractor(path, chunk_filter=self.extract_filter)
+            if not extractor.read_mca_file():
+                return None
+            chunks += extractor.analyzed_chunks
+        return chunks
+
+    def _run_parse_log(self):
+        from mc_block_parser import parse_blocks_info_log
+        return len(parse_blocks_info_log(self.log_file))
+
+    def _input_bytes(self, stage):
+        """阶段读取的数据量，提取阶段只计算范围内区块占用的扇区"""
+        if stage == "parse-log":
+            return os.path.getsize(self.log_file)
+        if stage == "analyze":
+            return sum(os.path.getsize(path) for path in self.region_files)
+        return sum(entry.sector_count * SECTOR_SIZE
+                   for path in self.region_files
+                   for entry in self.extract_filter.filter_entries(read_region_entries(path)))
+
+    def run_stage(self, stage):
+        """
+        运行一个阶段，返回结果字典，读取合成数据失败时返回None
+
+        先取repeat次计时的中位数计算吞吐量，并记录波动（最慢与最快之差占中位数的比例），
+        再在tracemalloc下单独运行一次测量峰值内存
+        """
+        run, unit = {
+            "analyze": (self._run_analyze, "区块"),
+            "extract": (self._run_extract, "区块"),
+            "parse-log": (self._run_parse_log, "方块")
+        }[stage]
+        input_bytes = self._input_bytes(stage)
+
+        # 区块读取代码会输出错误和提示，测量时丢弃输出
+        timings = []
+        items = 0
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+            for _ in range(self.repeat):
+                gc.collect()
+                start_time = time.perf_counter()
+                items = run()
+                elapsed = time.perf_counter() - start_time
+                if items is None:
+                    return None
+                timings.append(elapsed)
+
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                _current, peak_memory = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        median_time = max(statistics.median(timings), 1e-9)
+        return {
+            "seconds": median_time,
+            "min_seconds": min(timings),
+            "max_seconds": max(timings),
+            "spread": round((max(timings) - min(timings)) / median_time, 4),
+            "input_bytes": input_bytes,
+            "items": items,
+            "unit": unit,
+            "throughput": input_bytes / median_time,
+            "items_per_second": items / median_time,
+            "peak_memory": peak_memory
+        }
+
+    def run(self, stages=STAGES):
+        """生成合成数据并运行各阶段，返回{阶段: 结果}，有阶段运行失败时返回None"""
+        if self.fixture_dir is not None:
+            os.makedirs(self.fixture_dir, exist_ok=True)
+            return self._run_in(self.fixture_dir, stages)
+        with tempfile.TemporaryDirectory(prefix="mc_benchmark_") as fixture_dir:
+            return self._run_in(fixture_dir, stages)
+
+    def _run_in(self, fixture_dir, stages):
+        print(f"生成合成数据: {self.regions} 个区域文件 x {self.chunks_per_region} 个区块，"
+              f"{self.log_blocks} 个方块的日志...")
+        self.generate_fixtures(fixture_dir)
+
+        self.results = {}
+        for stage in stages:
+            print(f"运行 {stage} (重复 {self.repeat} 次)...")
+            result = self.run_stage(stage)
+            if result is None:
+                print(f"  {stage} 运行失败")
+                return None
+            self.results[stage] = result
+            print(f"  {format_rate(result['throughput'])}，{result['items_per_second']:.0f} {result['unit']}/秒，"
+                  f"波动 {result['spread']:.1%}，峰值内存 {format_bytes(result['peak_memory'])}")
+        return self.results
+
+    def to_baseline(self):
+        """返回可保存为基准的结果"""
+        return {
+            "version": BENCHMARK_VERSION,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "fixture": dict(self.fixture_params(), digest=self.fixture_digest),
+            "repeat": self.repeat,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "numpy": np.__version__
+            },
+            "stages": self.results
+        }
+
+    def save_baseline(self, path, pretty=False):
+        """把本次结果保存为基准"""
+        write_json(path, self.to_baseline(), pretty)
+        print(f"基准结果已保存到 {path}")
+
+    def compare(self, baseline, max_slowdown=DEFAULT_MAX_SLOWDOWN, max_memory_growth=DEFAULT_MAX_MEMORY_GROWTH):
+        """
+        与基准结果比较并输出每个阶段的差异
+
+        max_slowdown和max_memory_growth为百分比阈值；有阶段退化时返回False
+        """
+        if baseline.get("version") != BENCHMARK_VERSION:
+            print("基准文件格式版本不同，请使用 --update-baseline 重新生成")
+            return False
+
+        fixture = baseline.get("fixture", {})
+        if {key: fixture.get(key) for key in self.fixture_params()} != self.fixture_params():
+            print("基准使用的合成数据参数与本次不同，结果不可比较，请使用相同参数或 --update-baseline 重新生成")
+            return False
+        if fixture.get("digest") != self.fixture_digest:
+            # 参数相同但内容不同，一般是zlib或amulet_nbt版本变化，压缩后的数据量不同，吞吐量不可直接比较
+            print("合成数据内容与基准不同（可能是依赖库版本变化），结果不可比较，请使用 --update-baseline 重新生成")
+            return False
+        if baseline.get("repeat") != self.repeat:
+            print(f"基准的计时次数为 {baseline.get('repeat')}，本次为 {self.repeat}，结果不可比较，"
+                  f"请使用相同的 --repeat 或 --update-baseline 重新生成")
+            return False
+
+        print(f"\n与基准比较 (基准生成于 {baseline.get('created_at', '未知')}，"
+              f"吞吐量下降阈值 {max_slowdown:g}%，峰值内存增长阈值 {max_memory_growth:g}%):")
+        print(f"  {'阶段':<10} {'指标':<8} {'基准':>14} {'本次':>14} {'变化':>9}  结果")
+
+        passed = True
+        baseline_stages = baseline.get("stages", {})
+        for stage, result in self.results.items():
+            base = baseline_stages.get(stage)
+            if base is None:
+                print(f"  {stage:<10} 基准中没有该阶段，跳过")
+                continue
+
+            throughput_change = (result["throughput"] / base["throughput"] - 1) * 100 if base["throughput"] else 0.0
+            throughput_ok = throughput_change >= -max_slowdown
+            print(f"  {stage:<10} {'吞吐量':<8} {format_rate(base['throughput']):>14} "
+                  f"{format_rate(result['throughput']):>14} {throughput_change:>+8.1f}%  "
+                  f"{'通过' if throughput_ok else '退化'}")
+
+            memory_change = (result["peak_memory"] / base["peak_memory"] - 1) * 100 if base["peak_memory"] else 0.0
+            memory_ok = memory_change <= max_memory_growth
+            print(f"  {'':<10} {'峰值内存':<8} {format_bytes(base['peak_memory']):>14} "
+                  f"{format_bytes(result['peak_memory']):>14} {memory_change:>+8.1f}%  "
+                  f"{'通过' if memory_ok else '退化'}")
+
+            # 计时波动超过阈值时，阈值附近的判断不可靠
+            spread = max(result["spread"], base.get("spread", 0.0)) * 100
+            if spread > max_slowdown:
+                print(f"  {'':<10} 注意: 计时波动 {spread:.1f}% 超过吞吐量阈值，建议增加 --repeat 或减少机器负载")
+
+            passed = passed and throughput_ok and memory_ok
+
+        print("\n性能检查通过" if passed else "\n性能检查失败: 有阶段超过阈值")
+        return passed
+
+
+def format_rate(bytes_per_second):
+    """把吞吐量格式化为易读的字符串"""
+    return f"{format_bytes(bytes_per_second)}/秒"
+
+
+def load_baseline(path):
+    """读取基准文件，文件不存在时返回None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py benchmark 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["benchmark"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,32 +2,44 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
-import struct
+import sys
 import gzip
 import zlib
 import time
+from functools import partial
+import numpy as np
 import amulet_nbt as nbt
 from io import BytesIO
 from collections import defaultdict
 
+from mc_region_reader import SECTOR_SIZE, parse_region_coords, read_region_header, read_chunk_payload
+from mc_chunk_fingerprint import ChunkFingerprinter
+from mc_world_walker import WorldWalker, OVERWORLD
+from mc_progress import current_counter, report_error, report_notice, flush_messages
+from mc_report_writer import dumps, write_json, write_top_stats
+
 class MCBlockExtractor:
     """
     从Minecraft区域文件(.mca)中提取所有方块信息的工具类
     支持1.7.10及以上版本的Minecraft存档
     """
     
-    def __init__(self, mca_file_path):
-        """初始化提取器"""
+    def __init__(self, mca_file_path, fingerprinter=None, chunk_stream_path=None, chunk_filter=None):
+        """
+        初始化提取器
+        
+        fingerprinter为共享的ChunkFingerprinter时，内容相同的区段直接复用已缓存的解码结果；
+        chunk_stream_path不为None时，区块的方块列表在提取过程中逐行写入该JSON Lines文件，不保留在内存中；
+        chunk_filter为ChunkFilter时只读取和提取其中包含的区块
+        """
         self.mca_file_path = mca_file_path
+        self.fingerprinter = fingerprinter if fingerprinter is not None else ChunkFingerprinter()
+        self._fingerprint_baseline = self.fingerprinter.snapshot()
+        self.chunk_stream_path = chunk_stream_path
+        self._chunk_stream = None
+        self.chunk_filter = chunk_filter
         self.file_name = os.path.basename(mca_file_path)
-        try:
-            parts = self.file_name.replace('r.', '').replace('.mca', '').split('.')
-            self.region_x = int(parts[0])
-            self.region_z = int(parts[1])
-        except:
-            self.region_x = 0
-            self.region_z = 0
+        self.region_x, self.region_z = parse_region_coords(self.file_name)
         
         # 分析结果
         self.analyzed_chunks = 0
@@ -39,53 +51,46 @@ class MCBlockExtractor:
     def read_mca_file(self):
         """读取MCA文件并提取其内容"""
         try:
+            if self.chunk_stream_path is not None:
+                self._chunk_stream = open(self.chunk_stream_path, 'w', encoding='utf-8')
+            
             with open(self.mca_file_path, 'rb') as mca_file:
-                # 读取头部
-                header_data = mca_file.read(8192)  # 4096字节的位置信息 + 4096字节的时间戳信息
+                # 读取头部，分析区块位置和大小
+                chunks_to_analyze = read_region_header(mca_file, self.region_x, self.region_z)
                 
-                # 分析区块位置和大小
-                chunks_to_analyze = []
-                for chunk_index in range(1024):  # 32x32区块
-                    loc_offset = chunk_index * 4
-                    sectors_data = header_data[loc_offset:loc_offset+3]
-                    sectors_count = header_data[loc_offset+3]
-                    
-                    if sectors_count > 0:  # 区块存在
-                        offset = struct.unpack('>I', b'\x00' + sectors_data)[0] * 4096  # 转换为字节偏移
-                        size_in_sectors = sectors_count
-                        
-                        # 计算区块坐标
-                        chunk_x = (self.region_x * 32) + (chunk_index % 32)
-                        chunk_z = (self.region_z * 32) + (chunk_index // 32)
-                        
-                        chunks_to_analyze.append((chunk_index, chunk_x, chunk_z, offset, size_in_sectors))
+                # 只读取过滤范围内的区块数据
+                if self.chunk_filter is not None:
+                    chunks_to_analyze = self.chunk_filter.filter_entries(chunks_to_analyze)
                 
                 # 遍历并分析发现的区块
-                for i, (chunk_index, chunk_x, chunk_z, offset, size_in_sectors) in enumerate(chunks_to_analyze):
+                progress = current_counter()
+                bytes_counted = 0
+                for entry in chunks_to_analyze:
                     try:
-                        # 跳转到区块位置
-                        mca_file.seek(offset)
-                        
-                        # 读取区块数据长度
-                        length = struct.unpack('>I', mca_file.read(4))[0]
+                        compression_type, compressed_data = read_chunk_payload(mca_file, entry)
                         
-                        if length > 0:
-                            # 读取压缩类型
-                            compression_type = struct.unpack('B', mca_file.read(1))[0]
-                            
-                            # 读取压缩数据
-                            compressed_data = mca_file.read(length - 1)
-                            
+                        if compression_type is not None:
                             # 提取这个区块的方块数据
-                            self.extract_chunk_blocks(chunk_x, chunk_z, compression_type, compressed_data)
+                            self.extract_chunk_blocks(entry.chunk_x, entry.chunk_z, compression_type, compressed_data)
                     except Exception as e:
                         self.error_count += 1
-                        print(f"处理区块 ({chunk_x}, {chunk_z}) 时出错: {str(e)}")
+                        report_error("处理区块时出错", f"处理区块 ({entry.chunk_x}, {entry.chunk_z}) 时出错: {str(e)}")
+                    chunk_bytes = entry.sector_count * SECTOR_SIZE
+                    bytes_counted += chunk_bytes
+                    progress.add(bytes_read=chunk_bytes, chunks=1)
+                
+                # 头部、空闲扇区和被过滤的区块也计入已处理字节数
+                progress.add(bytes_read=max(os.fstat(mca_file.fileno()).st_size - bytes_counted, 0))
             
             return True
         except Exception as e:
-            print(f"读取MCA文件时出错: {str(e)}")
+            report_error("读取MCA文件时出错", f"读取MCA文件 {self.file_name} 时出错: {str(e)}")
             return False
+        finally:
+            if self._chunk_stream is not None:
+                self._chunk_stream.close()
+                self._chunk_stream = None
+            flush_messages()
     
     def extract_chunk_blocks(self, chunk_x, chunk_z, compression_type, compressed_data):
         """提取单个区块中的所有方块数据"""
@@ -96,7 +101,7 @@ class MCBlockExtractor:
             elif compression_type == 2:  # Zlib压缩
                 data = zlib.decompress(compressed_data)
             else:
-                print(f"未知的压缩类型 {compression_type} (区块: {chunk_x}, {chunk_z})")
+                report_error("未知的压缩类型", f"未知的压缩类型 {compression_type} (区块: {chunk_x}, {chunk_z})")
                 return
             
             # 解析NBT数据
@@ -125,86 +130,115 @@ class MCBlockExtractor:
                             # 1.7.10 - 1.12.2格式（旧格式）
                             blocks = section["Blocks"]
                             data = section.get("Data", None)  # 方块附加数据
+                            add = section.get("Add", None)    # 方块ID高4位（ID超过255的模组方块）
+                            
+                            # 内容相同的区段（例如整段的石头或水）只解码一次，缓存的是紧凑的数组形式
+                            fingerprint = self.fingerprinter.section_fingerprint(blocks, data, add)
+                            section_blocks = self.fingerprinter.section_cache.get(fingerprint)
+                            if section_blocks is None:
+                                section_blocks = self.decode_section_blocks(blocks, data, add)
+                                self.fingerprinter.section_cache.put(fingerprint, section_blocks)
+                            indices, block_ids, block_data = section_blocks
                             
-                            # 遍历该区段中的所有方块
-                            for y in range(16):
-                                for z in range(16):
-                                    for x in range(16):
-                                        index = y * 256 + z * 16 + x
-                                        if index < len(blocks):
-                                            block_id = blocks[index]
-                                            
-                                            # 获取附加数据（Minecraft使用半字节存储Data值）
-                                            block_data = 0
-                                            if data is not None and index // 2 < len(data):
-                                                if index % 2 == 0:
-                                                    block_data = data[index // 2] & 0x0F
-                                                else:
-                                                    block_data = (data[index // 2] >> 4) & 0x0F
-                                            
-                                            # 跳过空气方块以减少数据量
-                                            if block_id != 0:  # 0 = 空气
-                                                # 计算绝对坐标
-                                                abs_x = chunk_x * 16 + x
-                                                abs_y = section_y * 16 + y
-                                                abs_z = chunk_z * 16 + z
-                                                
-                                                # 转换为字符串ID
-                                                block_key = f"{block_id}:{block_data}"
-                                                
-                                                # 添加到区块的方块列表
-                                                block_info = {
-                                                    "position": [abs_x, abs_y, abs_z],
-                                                    "id": block_key
-                                                }
-                                                chunk_info["blocks"].append(block_info)
-                                                
-                                                # 更新统计信息
-                                                self.block_stats[block_key] += 1
-                                                self.total_blocks += 1
+                            # 计算绝对坐标并添加到区块的方块列表（只在输出时才展开为逐个方块的字典）
+                            base_x = chunk_x * 16
+                            base_y = section_y * 16
+                            base_z = chunk_z * 16
+                            for index, block_id, meta in zip(indices.tolist(), block_ids.tolist(), block_data.tolist()):
+                                chunk_info["blocks"].append({
+                                    "position": [base_x + (index & 0x0F), base_y + (index >> 8),
+                                                 base_z + ((index >> 4) & 0x0F)],
+                                    "id": f"{block_id}:{meta}"
+                                })
+                            
+                            # 更新统计信息
+                            keys, counts = np.unique(block_ids.astype(np.uint32) << 4 | block_data, return_counts=True)
+                            for key, count in zip(keys.tolist(), counts.tolist()):
+                                self.block_stats[f"{key >> 4}:{key & 0x0F}"] += count
+                            self.total_blocks += len(indices)
                         
                         elif "BlockStates" in section and "Palette" in section:
                             # 1.13+格式（新格式 - 使用调色板）
                             # 这是一个更复杂的数据格式，需要特殊处理
                             # 目前只是记录有这样的区段，实际解析需要更多代码
                             chunk_info["has_modern_format"] = True
-                            print(f"区块 ({chunk_x}, {chunk_z}) 使用现代区块格式（1.13+），暂不支持提取详细方块数据")
+                            report_notice("现代区块格式", f"区块 ({chunk_x}, {chunk_z}) 使用现代区块格式（1.13+），暂不支持提取详细方块数据")
             
             # 将区块信息添加到结果中
             if chunk_info.get("blocks") or chunk_info.get("has_modern_format"):
-                self.chunks_data.append(chunk_info)
+                if self._chunk_stream is not None:
+                    self._chunk_stream.write(dumps(chunk_info) + "\n")
+                else:
+                    self.chunks_data.append(chunk_info)
                 self.analyzed_chunks += 1
             
         except Exception as e:
             self.error_count += 1
-            print(f"提取区块 ({chunk_x}, {chunk_z}) 的方块时出错: {str(e)}")
+            report_error("提取区块时出错", f"提取区块 ({chunk_x}, {chunk_z}) 的方块时出错: {str(e)}")
+    
+    @staticmethod
+    def decode_section_blocks(blocks, data, add=None):
+        """
+        解码1.7.10 - 1.12.2格式区段中的方块
+        
+        Blocks中的字节按无符号处理，add为Add数组（方块ID的高4位），data为Data数组（半字节存储的数据值）；
+        返回(indices, block_ids, block_data)三个NumPy数组：非空气方块在区段内的索引（y * 256 + z * 16 + x）、
+        方块ID和数据值。整段都是非空气方块时也只占约20 KB，可以直接放进区段缓存
+        """
+        block_ids = blocks.np_array[:4096].view(np.uint8).astype(np.uint16)
+        count = len(block_ids)
+        if add is not None:
+            block_ids |= unpack_nibbles(add, count).astype(np.uint16) << 8
+        block_data = unpack_nibbles(data, count) if data is not None else np.zeros(count, dtype=np.uint8)
+        
+        # 跳过空气方块以减少数据量
+        indices = np.flatnonzero(block_ids).astype(np.uint16)
+        return indices, block_ids[indices], block_data[indices]
     
     def get_results(self):
-        """获取分析结果"""
-        return {
+        """获取分析结果，流式输出时区块详情位于chunks_file指向的文件中"""
+        results = {
             "file_name": self.file_name,
             "region_coords": [self.region_x, self.region_z],
             "analyzed_chunks": self.analyzed_chunks,
             "error_count": self.error_count,
             "total_blocks": self.total_blocks,
             "block_stats": dict(self.block_stats),
+            "fingerprint_stats": self.fingerprinter.get_summary(self._fingerprint_baseline),
             "chunks": self.chunks_data
         }
+        if self.chunk_stream_path is not None:
+            results["chunks_file"] = self.chunk_stream_path
+        return results
     
-    def save_results(self, output_json=None, output_summary=None):
-        """保存提取结果到文件"""
+    def save_results(self, output_json=None, output_summary=None, pretty=False, output_stats=None):
+        """
+        保存提取结果到文件，pretty为True时JSON使用缩进格式
+        
+        方块统计另外写入很小的output_stats文件（默认<文件名>_block_stats.json），
+        贴图分析等只需要统计的工具不必载入包含每个方块位置的完整结果
+        """
         if output_json is None:
             output_json = f"{self.file_name}_blocks.json"
         
         if output_summary is None:
             output_summary = f"{self.file_name}_summary.txt"
         
+        if output_stats is None:
+            output_stats = os.path.join(os.path.dirname(output_json), f"{self.file_name}_block_stats.json")
+        
         # 获取结果
         results = self.get_results()
         
         # 保存JSON数据
-        with open(output_json, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        write_json(output_json, results, pretty)
+        write_json(output_stats, {
+            "file_name": self.file_name,
+            "region_coords": [self.region_x, self.region_z],
+            "analyzed_chunks": self.analyzed_chunks,
+            "total_blocks": self.total_blocks,
+            "block_stats": results["block_stats"]
+        }, pretty)
         
         # 保存摘要文本
         with open(output_summary, 'w', encoding='utf-8') as f:
@@ -214,19 +248,78 @@ class MCBlockExtractor:
             f.write(f"区域坐标: {self.region_x}, {self.region_z}\n")
             f.write(f"分析区块数: {self.analyzed_chunks}\n")
             f.write(f"错误次数: {self.error_count}\n")
-            f.write(f"总方块数: {self.total_blocks}\n\n")
+            f.write(f"总方块数: {self.total_blocks}\n")
+            fingerprint_stats = results["fingerprint_stats"]
+            f.write(f"重复区段: {fingerprint_stats['section_hits']}/{fingerprint_stats['section_lookups']} "
+                    f"(去重率 {fingerprint_stats['section_dedup_ratio']:.2%})\n\n")
             
             if self.block_stats:
                 f.write("方块统计 (按数量排序):\n")
-                for block_id, count in sorted(self.block_stats.items(), key=lambda x: x[1], reverse=True):
-                    f.write(f"  {block_id}: {count}\n")
+                write_top_stats(f, self.block_stats)
             
         print(f"提取完成，结果保存至 {output_json} 和 {output_summary}")
         return output_json, output_summary
 
 
-def extract_blocks_from_region_files(save_dir, output_dir=None):
-    """从多个区域文件中提取方块信息"""
+def unpack_nibbles(array, count):
+    """把半字节存储的字节数组标签（低4位在前）展开为count个uint8值，数组不够长时其余为0"""
+    packed = array.np_array.view(np.uint8)
+    values = np.zeros(count, dtype=np.uint8)
+    available = min(count, len(packed) * 2)
+    values[0:available:2] = packed[:(available + 1) // 2] & 0x0F
+    values[1:available:2] = packed[:available // 2] >> 4
+    return values
+
+
+# 每个进程共享一个指纹缓存，跨文件的重复区段也只解码一次
+_task_fingerprinter = None
+
+
+def extract_region_task(task, output_dir, split_dimensions=False, stream=False, chunk_filter=None,
+                        pretty=False):
+    """
+    提取单个区域文件的方块并保存结果（供WorldWalker调度），返回摘要，提取失败时返回None
+    
+    split_dimensions为True时结果保存到output_dir下以维度命名的子目录；
+    stream为True时区块的方块列表逐行写入<文件名>_chunks.jsonl
+    """
+    global _task_fingerprinter
+    if _task_fingerprinter is None:
+        _task_fingerprinter = ChunkFingerprinter()
+    
+    if split_dimensions:
+        output_dir = os.path.join(output_dir, task.dimension)
+        os.makedirs(output_dir, exist_ok=True)
+    chunk_stream_path = os.path.join(output_dir, f"{task.file_name}_chunks.jsonl") if stream else None
+    
+    start_time = time.time()
+    chunk_filter = chunk_filter.for_dimension(task.dimension) if chunk_filter is not None else None
+    extractor = MCBlockExtractor(task.path, _task_fingerprinter, chunk_stream_path, chunk_filter)
+    if not extractor.read_mca_file():
+        return None
+    
+    # 保存结果到输出目录
+    json_file = os.path.join(output_dir, f"{task.file_name}_blocks.json")
+    summary_file = os.path.join(output_dir, f"{task.file_name}_summary.txt")
+    extractor.save_results(json_file, summary_file, pretty)
+    
+    return {
+        "total_blocks": extractor.total_blocks,
+        "error_count": extractor.error_count,
+        "elapsed_time": time.time() - start_time
+    }
+
+
+def extract_blocks_from_region_files(save_dir, output_dir=None, all_dimensions=False, workers=1,
+                                     stream=False, chunk_filter=None, show_progress=True, pretty=False):
+    """
+    从多个区域文件中提取方块信息
+    
+    all_dimensions为True时同时处理DIM-1、DIM1等所有维度，结果按维度保存到output_dir下的子目录；
+    workers大于1时使用多进程并行处理；stream为True时方块列表边提取边写入磁盘；
+    chunk_filter为ChunkFilter时只打开可能包含所需区块的区域文件，并且只读取和解码所需的区块；
+    pretty为True时JSON结果使用缩进格式（默认输出紧凑JSON）
+    """
     if output_dir is None:
         output_dir = "block_data"
     
@@ -235,59 +328,42 @@ def extract_blocks_from_region_files(save_dir, output_dir=None):
     
     # 获取region目录
     region_dir = os.path.join(save_dir, "region")
-    if not os.path.exists(region_dir):
+    if not all_dimensions and not os.path.exists(region_dir):
         print(f"找不到region目录: {region_dir}")
         return False
     
-    # 获取所有mca文件
-    mca_files = [f for f in os.listdir(region_dir) if f.endswith(".mca")]
+    # 获取所有mca文件，大文件优先
+    walker = WorldWalker(save_dir, None if all_dimensions else [OVERWORLD],
+                         chunk_filter=chunk_filter, show_progress=show_progress)
+    tasks = walker.build_work_queue()
     
-    if not mca_files:
-        print(f"在 {region_dir} 中找不到mca文件")
+    if not tasks:
+        print(f"在 {save_dir} 中找不到mca文件")
         return False
     
-    print(f"找到 {len(mca_files)} 个区域文件，开始提取方块信息...")
+    print(f"找到 {len(tasks)} 个区域文件，开始提取方块信息...")
     
-    # 处理每个区域文件
-    for i, mca_file in enumerate(mca_files):
-        mca_path = os.path.join(region_dir, mca_file)
-        print(f"处理文件 {i+1}/{len(mca_files)}: {mca_file}")
-        
-        start_time = time.time()
-        extractor = MCBlockExtractor(mca_path)
-        success = extractor.read_mca_file()
-        
-        if success:
-            # 保存结果到输出目录
-            json_file = os.path.join(output_dir, f"{mca_file}_blocks.json")
-            summary_file = os.path.join(output_dir, f"{mca_file}_summary.txt")
-            extractor.save_results(json_file, summary_file)
-            
-            elapsed_time = time.time() - start_time
-            print(f"  完成，提取了 {extractor.total_blocks} 个方块，耗时: {elapsed_time:.2f}秒")
+    def on_result(task, summary):
+        if summary is None:
+            print(f"  提取失败: [{task.dimension}] {task.file_name}")
         else:
-            print(f"  提取失败")
+            print(f"  提取了 {summary['total_blocks']} 个方块，耗时: {summary['elapsed_time']:.2f}秒")
+    
+    # 所有维度的文件在同一个队列中调度
+    task_func = partial(extract_region_task, output_dir=output_dir,
+                        split_dimensions=all_dimensions, stream=stream, chunk_filter=chunk_filter,
+                        pretty=pretty)
+    walker.run(task_func, workers, tasks=tasks, on_result=on_result)
     
     print(f"\n所有区域文件处理完成，结果保存在 {output_dir} 目录")
     return True
 
 
-def main():
-    """主函数"""
-    # 指定存档目录 - 这里使用题目要求的路径
-    save_dir = "save_world/test"
-    
-    # 创建输出目录
-    output_dir = "extracted_blocks"
-    
-    # 提取方块数据
-    success = extract_blocks_from_region_files(save_dir, output_dir)
-    
-    if success:
-        print("\n方块数据提取任务完成！")
-    else:
-        print("\n方块数据提取任务失败！")
+def main(argv=None):
+    """主函数，参数与 mc_cli.py extract 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["extract"] + (sys.argv[1:] if argv is None else list(argv)))
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -19,7 +19,8 @@ Minecraft方块信息解析器 (Minecraft Block Information Parser)
 
 使用方法：
 1. 确保blocks_info.log文件位于脚本同目录下
-2. 运行脚本：python mc_block_parser.py
+2. 运行脚本：python mc_block_parser.py [日志文件] [-o 输出文件]
+   （等同于 python mc_cli.py parse-log）
 3. 生成的blocks_data.json文件包含所有解析出的方块信息
 
 作者：神楽坂牧月
@@ -29,6 +30,7 @@ Minecraft方块信息解析器 (Minecraft Block Information Parser)
 """
 
 import re
+import sys
 import json
 import os
 from datetime import datetime
@@ -144,17 +146,10 @@ def save_to_json(blocks_data, output_file):
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, ensure_ascii=False, indent=2)
 
-def main():
-    input_file = 'blocks_info.log'
-    output_file = 'blocks_data.json'
-    
-    print(f"开始解析Minecraft方块信息...")
-    try:
-        blocks_data = parse_blocks_info_log(input_file)
-        save_to_json(blocks_data, output_file)
-        print(f"解析完成! 共处理了 {len(blocks_data)} 个方块，数据已保存到 {output_file}")
-    except Exception as e:
-        print(f"处理过程中出现错误: {e}")
+def main(argv=None):
+    """主函数，参数与 mc_cli.py parse-log 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["parse-log"] + (sys.argv[1:] if argv is None else list(argv)))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
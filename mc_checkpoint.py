@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+整个存档扫描的检查点日志
+
+扫描过程中，每完成一个区域文件就把该文件对汇总结果的贡献（统计数据和问题区块）追加到
+JSON Lines格式的日志文件中，并定期fsync到磁盘。扫描被中断（内存不足、维护停机等）后，
+以恢复模式重新运行时读取日志，跳过已完成且未被修改过的区域文件，并把日志中的结果合并回汇总。
+
+日志第一行记录扫描参数，参数不同（例如问题ID列表变化）时旧日志作废；
+最后一行可能因进程被杀而不完整，读取时忽略。
+"""
+
+import os
+import json
+import time
+
+# 日志格式版本，记录结构变化时递增以使旧日志失效
+CHECKPOINT_VERSION = 1
+
+# 两次fsync之间的最小间隔（秒）
+CHECKPOINT_SYNC_INTERVAL = 30.0
+
+
+def region_state(path):
+    """返回区域文件的(大小, 修改时间)，用于判断日志中的记录是否仍然有效"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class CheckpointJournal:
+    """
+    检查点日志
+    记录以(维度名称, 区域文件名)为键
+    """
+
+    def __init__(self, path, params):
+        """params为扫描参数（可JSON序列化的字典），恢复时必须与日志中记录的参数相同"""
+        self.path = path
+        # 与日志中读出的参数比较前先统一为JSON形式（元组变为列表等）
+        self.params = json.loads(json.dumps(params))
+        self._file = None
+        self._last_sync = 0.0
+
+    def load(self):
+        """
+        读取日志中已完成的区域记录，返回{(维度名称, 文件名): 记录}
+
+        日志不存在、格式版本或扫描参数不同时返回空字典
+        """
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "null")
+                if (not isinstance(header, dict) or header.get("version") != CHECKPOINT_VERSION
+                        or header.get("params") != self.params):
+                    print(f"检查点 {self.path} 的扫描参数与本次不同，将重新扫描")
+                    return {}
+
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 中断时写了一半的行
+                        break
+                    records[(record["dimension"], record["file"])] = record
+        except OSError:
+            return {}
+        return records
+
+    def start(self, records=None):
+        """
+        开始写日志：重写头部和仍然有效的旧记录，之后的记录追加在后面
+
+        先写入临时文件再替换，避免中断时连旧日志也丢失
+        """
+        temp_file = self.path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"version": CHECKPOINT_VERSION, "params": self.params}, ensure_ascii=False) + "\n")
+            for record in (records or {}).values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        """追加一条区域记录，距上次fsync超过CHECKPOINT_SYNC_INTERVAL时同步到磁盘"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= CHECKPOINT_SYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        """同步并关闭日志"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """扫描完成、报告已生成后删除日志"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
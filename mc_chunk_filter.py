@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+区域与区块坐标过滤
+
+根据区域坐标范围、区块坐标范围（包围盒）和区块坐标列表，
+只从文件名判断需要打开哪些r.X.Z.mca文件，再从头部位置表判断需要读取哪些区块，
+不在范围内的区块数据既不读取也不解码。多个条件同时给出时取交集。
+"""
+
+import json
+
+from mc_region_reader import parse_region_coords
+from mc_report_writer import iter_json_lines
+
+# 每个区域文件在X和Z方向上包含的区块数
+REGION_CHUNK_WIDTH = 32
+
+
+def issue_chunk(chunk):
+    """把升级分析的问题区块记录转换为(维度, 区块X, 区块Z)，没有维度信息的旧报告返回(区块X, 区块Z)"""
+    x, z = chunk["coords"]
+    dimension = chunk.get("dimension")
+    if dimension is None:
+        return (int(x), int(z))
+    return (dimension, int(x), int(z))
+
+
+def load_chunk_list(path):
+    """
+    读取区块坐标列表文件，返回区块坐标列表
+
+    支持四种格式：每行一个"x,z"的文本文件（#开头的行为注释）、
+    [[x, z], ...]形式的JSON数组、升级分析JSON报告（读取其中的chunks_with_issues），
+    以及升级分析逐行写出的问题区块列表（.jsonl）；
+    前两种格式返回的(区块X, 区块Z)对所有维度生效，升级分析的问题区块带有维度，
+    返回(维度, 区块X, 区块Z)，只对所在的维度生效
+    """
+    if path.endswith(".jsonl"):
+        return [issue_chunk(chunk) for chunk in iter_json_lines(path)]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    stripped = text.lstrip()
+    if stripped.startswith("[") or stripped.startswith("{"):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return [issue_chunk(chunk) for chunk in data.get("chunks_with_issues", [])]
+        return [(int(x), int(z)) for x, z in data]
+
+    chunks = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        x, z = line.split(",")
+        chunks.append((int(x), int(z)))
+    return chunks
+
+
+class ChunkFilter:
+    """
+    区域文件和区块过滤器
+    只保存坐标范围和坐标集合，可以直接传给工作进程
+    """
+
+    def __init__(self, region_range=None, chunk_box=None, chunks=None):
+        """
+        初始化过滤器
+
+        region_range为(最小X, 最小Z, 最大X, 最大Z)的区域坐标范围（含边界）；
+        chunk_box为(最小X, 最小Z, 最大X, 最大Z)的区块坐标范围（含边界）；
+        chunks为区块坐标的列表，(x, z)对所有维度生效，(维度, x, z)只对该维度生效；为None的条件不限制
+
+        带维度的区块列表需要先用for_dimension()得到单个维度的过滤器，
+        直接使用时按所有维度的区块合计判断
+        """
+        self.region_range = region_range
+        self.chunk_box = chunk_box
+        self.chunks = None
+        self.dimension_chunks = {}
+        if chunks is not None:
+            any_dimension = set()
+            dimension_chunks = {}
+            for chunk in chunks:
+                if len(chunk) == 3:
+                    dimension, x, z = chunk
+                    dimension_chunks.setdefault(dimension, set()).add((int(x), int(z)))
+                else:
+                    x, z = chunk
+                    any_dimension.add((int(x), int(z)))
+            self.dimension_chunks = {dimension: frozenset(coords) for dimension, coords in dimension_chunks.items()}
+            self.chunks = frozenset(any_dimension.union(*self.dimension_chunks.values()))
+            self._any_dimension_chunks = frozenset(any_dimension)
+        # 区块列表涉及的区域文件，用于只凭文件名跳过无关文件
+        self._chunk_regions = (frozenset((x >> 5, z >> 5) for x, z in self.chunks)
+                               if self.chunks is not None else None)
+
+    def for_dimension(self, dimension):
+        """返回只对某个维度生效的过滤器，区块列表中其他维度的区块被排除"""
+        if not self.dimension_chunks:
+            return self
+        chunks = self._any_dimension_chunks | self.dimension_chunks.get(dimension, frozenset())
+        return ChunkFilter(self.region_range, self.chunk_box, chunks)
+
+    @property
+    def filters_chunks(self):
+        """是否需要逐个区块判断（只有区域范围时整个文件都需要读取）"""
+        return self.chunk_box is not None or self.chunks is not None
+
+    def includes_region(self, region_x, region_z):
+        """判断区域文件中是否可能包含需要的区块"""
+        if self.region_range is not None:
+            min_x, min_z, max_x, max_z = self.region_range
+            if not (min_x <= region_x <= max_x and min_z <= region_z <= max_z):
+                return False
+
+        if self.chunk_box is not None:
+            min_x, min_z, max_x, max_z = self.chunk_box
+            first_x = region_x * REGION_CHUNK_WIDTH
+            first_z = region_z * REGION_CHUNK_WIDTH
+            if (first_x + REGION_CHUNK_WIDTH - 1 < min_x or first_x > max_x
+                    or first_z + REGION_CHUNK_WIDTH - 1 < min_z or first_z > max_z):
+                return False
+
+        if self._chunk_regions is not None and (region_x, region_z) not in self._chunk_regions:
+            return False
+
+        return True
+
+    def includes_region_file(self, file_name):
+        """根据r.X.Z.mca文件名判断是否需要打开该文件"""
+        return self.includes_region(*parse_region_coords(file_name))
+
+    def includes_chunk(self, chunk_x, chunk_z):
+        """判断单个区块是否需要读取"""
+        if not self.includes_region(chunk_x >> 5, chunk_z >> 5):
+            return False
+
+        if self.chunk_box is not None:
+            min_x, min_z, max_x, max_z = self.chunk_box
+            if not (min_x <= chunk_x <= max_x and min_z <= chunk_z <= max_z):
+                return False
+
+        if self.chunks is not None and (chunk_x, chunk_z) not in self.chunks:
+            return False
+
+        return True
+
+    def to_dict(self):
+        """返回可JSON序列化的过滤条件，用于记录扫描参数"""
+        return {
+            "region_range": list(self.region_range) if self.region_range is not None else None,
+            "chunk_box": list(self.chunk_box) if self.chunk_box is not None else None,
+            "chunks": self._chunks_to_list() if self.chunks is not None else None
+        }
+
+    def _chunks_to_list(self):
+        """区块列表的JSON形式，带维度的区块写为[维度, x, z]"""
+        if not self.dimension_chunks:
+            return sorted([x, z] for x, z in self.chunks)
+        chunks = sorted([x, z] for x, z in self._any_dimension_chunks)
+        for dimension in sorted(self.dimension_chunks):
+            chunks.extend(sorted([dimension, x, z] for x, z in self.dimension_chunks[dimension]))
+        return chunks
+
+    def filter_entries(self, entries):
+        """从区域文件头部的ChunkEntry列表中筛选需要读取的区块"""
+        if not self.filters_chunks:
+            return entries
+        return [entry for entry in entries if self.includes_chunk(entry.chunk_x, entry.chunk_z)]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+区段指纹与内容去重
+
+对解码后的区段计算内容哈希（安装了xxhash时使用xxh3_128，否则使用blake2b），
+并以LRU方式缓存每个指纹对应的解码结果，使内容相同的区段（例如整段的空气、石头或水）只需解码一次。
+
+区块的压缩数据包含xPos/zPos和实体的绝对坐标，不同位置的区块即使地形相同，数据也不会相同，
+因此不在整个区块的层面去重。
+"""
+
+import hashlib
+from collections import OrderedDict
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def content_hash(*parts):
+    """计算若干字节串的内容哈希，返回16字节摘要"""
+    if xxhash is not None:
+        hasher = xxhash.xxh3_128()
+    else:
+        hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part)
+    return hasher.digest()
+
+
+class LRUCache:
+    """按最近使用顺序淘汰的简单缓存，同时记录命中统计"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """查询缓存，未命中时返回None"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def dedup_ratio(self):
+        """命中次数占查询次数的比例"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class ChunkFingerprinter:
+    """
+    区段指纹计算器
+
+    同一个实例可以在多个区域文件的提取器之间共享，
+    使跨文件的重复内容也能命中缓存
+    """
+
+    def __init__(self, max_section_entries=256):
+        """初始化指纹计算器，每个区段结果是紧凑的数组形式（最多约20 KB），默认最多占用约5 MB"""
+        self.section_cache = LRUCache(max_section_entries)
+
+    @staticmethod
+    def section_fingerprint(*arrays):
+        """
+        计算解码后区段的指纹
+
+        参数为区段中的字节数组标签（如Blocks、Data、Add），缺失的数组传入None
+        """
+        parts = []
+        for array in arrays:
+            # 用长度前缀区分缺失数组与空数组
+            if array is None:
+                parts.append(b"\xff")
+            else:
+                data = array.np_array.tobytes()
+                parts.append(len(data).to_bytes(4, "big"))
+                parts.append(data)
+        return content_hash(*parts)
+
+    def snapshot(self):
+        """记录当前的查询与命中次数，用于统计某一段处理的去重情况"""
+        return (self.section_cache.lookups, self.section_cache.hits)
+
+    def get_summary(self, baseline=None):
+        """
+        获取去重统计
+
+        baseline为snapshot()的返回值时，只统计该快照之后的查询
+        """
+        section_lookups, section_hits = self.snapshot()
+        if baseline is not None:
+            section_lookups -= baseline[0]
+            section_hits -= baseline[1]
+        return build_summary(section_lookups, section_hits)
+
+
+def build_summary(section_lookups, section_hits):
+    """由查询与命中次数构造去重统计"""
+    return {
+        "hash_algorithm": "xxh3_128" if xxhash is not None else "blake2b",
+        "section_lookups": section_lookups,
+        "section_hits": section_hits,
+        "section_dedup_ratio": round(section_hits / section_lookups, 4) if section_lookups else 0.0
+    }
+
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Minecraft区块批量删除工具
+
+根据MinecraftSaveUpgradeHelper找出的问题区块列表，或者形如
+"InhabitedTime < 100 and no tile entities" 的规则，从区域文件中删除区块。
+每个区域文件只读取和重写一次：被删除的区块从位置表中清除，其余区块紧密重写（见mc_region_writer）。
+被删除的区块会在游戏中重新生成，操作前请务必备份存档。
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import operator
+import amulet_nbt as nbt
+from io import BytesIO
+from collections import defaultdict
+
+from mc_region_reader import decompress_chunk, list_region_files
+from mc_region_writer import MCRegionCompactor
+from mc_world_walker import find_dimension_region_dirs, OVERWORLD
+from mc_report_writer import write_json, iter_json_lines
+
+# 规则中支持的比较运算符
+RULE_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+RULE_COMPARISON_PATTERN = re.compile(r'^(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+)$')
+
+
+def parse_prune_rule(rule_text):
+    """
+    解析删除规则，返回接收区块Level标签、返回是否删除的函数
+
+    规则由and连接的若干条件组成，支持：
+      - "<字段> <运算符> <整数>"，字段为Level下的数值标签，如InhabitedTime、LastUpdate
+      - "no tile entities"：区块中没有方块实体
+      - "no entities"：区块中没有实体
+    字段不存在时该条件视为不满足，即不删除区块
+    """
+    conditions = []
+    for clause in re.split(r'\s+and\s+', rule_text.strip(), flags=re.IGNORECASE):
+        clause = clause.strip()
+        normalized = " ".join(clause.lower().split())
+
+        if normalized == "no tile entities":
+            conditions.append(lambda level: len(level.get("TileEntities") or []) == 0)
+            continue
+        if normalized == "no entities":
+            conditions.append(lambda level: len(level.get("Entities") or []) == 0)
+            continue
+
+        match = RULE_COMPARISON_PATTERN.match(clause)
+        if not match:
+            raise ValueError(f"无法解析的删除规则条件: {clause}")
+        field, op, value = match.group(1), RULE_OPERATORS[match.group(2)], int(match.group(3))
+
+        def compare(level, field=field, op=op, value=value):
+            return field in level and op(int(level[field]), value)
+        conditions.append(compare)
+
+    if not conditions:
+        raise ValueError("删除规则不能为空")
+
+    return lambda level: all(condition(level) for condition in conditions)
+
+
+def region_file_for_chunk(chunk_x, chunk_z):
+    """返回区块所在区域文件的文件名"""
+    return f"r.{chunk_x >> 5}.{chunk_z >> 5}.mca"
+
+
+class MCChunkPruner:
+    """
+    区块批量删除器
+    每个区域文件只做一次流式的读取和重写
+    """
+
+    def __init__(self, save_dir, compression_level=None, dry_run=False):
+        """
+        初始化删除器
+
+        dry_run为True时只统计将被删除的区块，不修改任何文件
+        """
+        self.save_dir = save_dir
+        self.compression_level = compression_level
+        self.dry_run = dry_run
+
+        # 删除目标：(维度名称, 区域文件名) -> 区块坐标集合
+        self.target_chunks = defaultdict(set)
+        self.rule = None
+        self.rule_text = None
+        self.rule_dimensions = ()
+
+        # 删除结果
+        self.pruned_chunks = []
+        self.region_results = []
+        self.error_count = 0
+
+    def add_chunks(self, coords_list, dimension=OVERWORLD):
+        """添加某个维度中要删除的区块坐标列表"""
+        for chunk_x, chunk_z in coords_list:
+            key = (dimension, region_file_for_chunk(chunk_x, chunk_z))
+            self.target_chunks[key].add((chunk_x, chunk_z))
+
+    def add_chunks_with_issues(self, chunks_with_issues):
+        """
+        添加MinecraftSaveUpgradeHelper输出的问题区块
+
+        chunks_with_issues可以是任意可迭代对象，在同一进程中使用时传入helper.iter_issues()即可
+        """
+        for chunk in chunks_with_issues:
+            self.add_chunks([tuple(chunk["coords"])], chunk.get("dimension", OVERWORLD))
+
+    def load_issues_from_report(self, report_json):
+        """
+        从升级分析的JSON报告中读取问题区块
+
+        也可以直接给出升级分析逐行写出的问题区块列表（.jsonl），不需要载入整个报告
+        """
+        if report_json.endswith(".jsonl"):
+            self.add_chunks_with_issues(iter_json_lines(report_json))
+            return
+        with open(report_json, 'r', encoding='utf-8') as f:
+            report_data = json.load(f)
+        self.add_chunks_with_issues(report_data.get("chunks_with_issues", []))
+
+    def set_rule(self, rule, dimensions=(OVERWORLD,)):
+        """
+        设置删除规则，可以是规则字符串或接收Level标签的函数
+
+        dimensions为规则适用的维度名称，None表示所有维度
+        """
+        self.rule_dimensions = dimensions
+        if isinstance(rule, str):
+            self.rule_text = rule
+            self.rule = parse_prune_rule(rule)
+        else:
+            self.rule_text = getattr(rule, "__name__", repr(rule))
+            self.rule = rule
+
+    def _rule_applies(self, dimension):
+        """判断删除规则是否适用于某个维度"""
+        return self.rule is not None and (self.rule_dimensions is None or dimension in self.rule_dimensions)
+
+    def _should_prune(self, dimension, mca_file, entry, compression_type, compressed_data):
+        """判断单个区块是否需要删除"""
+        if (entry.chunk_x, entry.chunk_z) in self.target_chunks.get((dimension, mca_file), ()):
+            return True
+        if not self._rule_applies(dimension):
+            return False
+
+        nbt_data = nbt.load(BytesIO(decompress_chunk(compression_type, compressed_data)))
+        level = nbt_data.tag["Level"] if "Level" in nbt_data.tag else nbt_data.tag
+        return self.rule(level)
+
+    def prune_region(self, dimension, region_dir, mca_file):
+        """删除单个区域文件中的目标区块"""
+        mca_path = os.path.join(region_dir, mca_file)
+        # 预演时保留的区块不会写出，不需要重新压缩
+        compactor = MCRegionCompactor(mca_path, None if self.dry_run else self.compression_level)
+        pruned = []
+
+        def keep_chunk(entry, compression_type, compressed_data):
+            try:
+                if self._should_prune(dimension, mca_file, entry, compression_type, compressed_data):
+                    pruned.append([entry.chunk_x, entry.chunk_z])
+                    return False
+            except Exception as e:
+                # 无法判断的区块保留
+                self.error_count += 1
+                print(f"判断区块 ({entry.chunk_x}, {entry.chunk_z}) 时出错: {str(e)}")
+            return True
+
+        if self.dry_run:
+            try:
+                with open(mca_path, 'rb') as f:
+                    for _ in compactor.iter_chunks(f, keep_chunk):
+                        pass
+                success = True
+            except Exception as e:
+                compactor.error_count += 1
+                print(f"读取区域文件 {mca_file} 时出错: {str(e)}")
+                success = False
+        else:
+            success = compactor.compact(keep_chunk=keep_chunk)
+
+        result = compactor.get_results()
+        result["dimension"] = dimension
+        result["pruned_chunks"] = len(pruned) if success else 0
+        if not self.dry_run and not success:
+            result["bytes_reclaimed"] = 0
+        self.region_results.append(result)
+        if success:
+            self.pruned_chunks.extend({"dimension": dimension, "file": mca_file, "coords": coords}
+                                      for coords in pruned)
+        else:
+            self.error_count += 1
+        return success
+
+    def prune(self, max_files=None):
+        """对存档执行删除，每个区域文件一次流式处理"""
+        # (维度名称, region目录, 区域文件名)
+        mca_files = []
+        for dimension, region_dir in find_dimension_region_dirs(self.save_dir):
+            for mca_file in sorted(list_region_files(region_dir)):
+                # 规则适用的维度需要检查所有区域文件，其他维度只打开包含目标区块的区域文件
+                if self._rule_applies(dimension) or (dimension, mca_file) in self.target_chunks:
+                    mca_files.append((dimension, region_dir, mca_file))
+
+        if not mca_files:
+            print("没有需要处理的区域文件")
+            return False
+
+        # 限制处理文件数量（如果指定）
+        if max_files and max_files > 0:
+            mca_files = mca_files[:max_files]
+
+        mode = "预演" if self.dry_run else "删除"
+        print(f"开始{mode}，共 {len(mca_files)} 个区域文件...")
+
+        start_time = time.time()
+        for i, (dimension, region_dir, mca_file) in enumerate(mca_files):
+            print(f"处理文件 {i+1}/{len(mca_files)}: [{dimension}] {mca_file}")
+            self.prune_region(dimension, region_dir, mca_file)
+
+        elapsed_time = time.time() - start_time
+        print(f"{mode}完成，共 {len(self.pruned_chunks)} 个区块，耗时: {elapsed_time:.2f}秒")
+        return True
+
+    def get_results(self):
+        """获取删除结果"""
+        return {
+            "save_directory": self.save_dir,
+            "dry_run": self.dry_run,
+            "rule": self.rule_text,
+            "target_chunk_count": sum(len(coords) for coords in self.target_chunks.values()),
+            "pruned_chunk_count": len(self.pruned_chunks),
+            "bytes_reclaimed": sum(r["bytes_reclaimed"] for r in self.region_results),
+            "error_count": self.error_count,
+            "regions": self.region_results,
+            "pruned_chunks": self.pruned_chunks
+        }
+
+    def save_report(self, output_dir="prune_results", pretty=False):
+        """保存删除结果到JSON文件，pretty为True时使用缩进格式"""
+        os.makedirs(output_dir, exist_ok=True)
+        json_file = os.path.join(output_dir, "prune_report.json")
+
+        results = self.get_results()
+        results["analysis_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        write_json(json_file, results, pretty)
+
+        print(f"删除报告已保存到 {json_file}")
+        return json_file
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py prune 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["prune"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
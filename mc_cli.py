@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Minecraft存档工具命令行入口
+
+所有脚本的功能通过子命令调用，存档目录、输出目录和性能参数（进程数、流式输出、缓存目录、
+区域/区块坐标过滤、进度输出）都可以在命令行中指定，例如：
+
+    python mc_cli.py analyze save_world --workers 4 --stream
+    python mc_cli.py upgrade-check save_world --all-dimensions --deep-scan --playerdata
+    python mc_cli.py extract save_world --region-range=-2,-2,1,1
+    python mc_cli.py analyze save_world --chunk-box=-8,-8,8,8
+    python mc_cli.py parse-log blocks_info.log -o blocks_data.json
+    python mc_cli.py textures extracted_blocks --blocks-data blocks_data.json
+    python mc_cli.py benchmark --baseline benchmark_baseline.json
+
+amulet_nbt和NumPy只在需要解析存档的子命令中才导入，parse-log等子命令不会加载它们。
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+def parse_coordinate_box(text):
+    """解析"X1,Z1,X2,Z2"格式的坐标范围（含边界），返回(最小X, 最小Z, 最大X, 最大Z)"""
+    try:
+        x1, z1, x2, z2 = (int(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"坐标范围格式应为 X1,Z1,X2,Z2: {text}")
+    return (min(x1, x2), min(z1, z2), max(x1, x2), max(z1, z2))
+
+
+def _add_performance_arguments(parser, stream=True, cache=False):
+    """添加各子命令共用的性能参数"""
+    group = parser.add_argument_group("性能参数")
+    group.add_argument("-j", "--workers", type=int, default=1,
+                       help="并行处理区域文件的进程数 (默认: 1)")
+    if stream:
+        group.add_argument("--stream", action="store_true",
+                           help="区块详情边处理边写入磁盘，不在内存中保留")
+    if cache:
+        group.add_argument("--cache-dir",
+                           help="缓存文件目录 (默认: 输出目录)")
+    group.add_argument("--region-range", type=parse_coordinate_box, metavar="X1,Z1,X2,Z2",
+                       help="只处理区域坐标在此范围内的区域文件（含边界）")
+    group.add_argument("--chunk-box", type=parse_coordinate_box, metavar="X1,Z1,X2,Z2",
+                       help="只读取区块坐标在此范围内的区块（含边界）")
+    group.add_argument("--chunks", metavar="FILE",
+                       help='只读取列表中的区块：每行"x,z"的文本文件、[[x, z], ...]的JSON文件（对所有维度生效）'
+                            '或升级分析JSON报告/问题区块列表.jsonl（问题区块只在其所在的维度中读取）')
+    group.add_argument("--no-progress", action="store_true",
+                       help="不输出每个区域文件的完成进度")
+
+
+def _parse_stages(text):
+    """解析逗号分隔的基准测试阶段列表"""
+    stages = [stage.strip() for stage in text.split(",") if stage.strip()]
+    valid = ("analyze", "extract", "parse-log")
+    for stage in stages:
+        if stage not in valid:
+            raise argparse.ArgumentTypeError(f"未知的阶段 {stage}，可选: {', '.join(valid)}")
+    return ",".join(stages)
+
+
+def _parse_repeat(text):
+    """解析基准测试的计时次数，至少3次"""
+    repeat = int(text)
+    if repeat < 3:
+        raise argparse.ArgumentTypeError("计时次数至少为3，单次计时的波动可能超过吞吐量阈值")
+    return repeat
+
+
+def _build_chunk_filter(args):
+    """根据坐标过滤参数构建ChunkFilter，没有给出任何过滤条件时返回None"""
+    if args.region_range is None and args.chunk_box is None and args.chunks is None:
+        return None
+
+    from mc_chunk_filter import ChunkFilter, load_chunk_list
+
+    chunks = load_chunk_list(args.chunks) if args.chunks else None
+    return ChunkFilter(region_range=args.region_range, chunk_box=args.chunk_box, chunks=chunks)
+
+
+def _load_upgrade_rules(rules_file):
+    """
+    读取升级检查规则，返回(问题实体, 问题方块实体, 问题物品)
+
+    规则文件为JSON对象，可包含entities、tile_entities、items三个列表，未给出的列表使用默认值
+    """
+    from mc_save_upgrade_helper import (
+        DEFAULT_PROBLEMATIC_ENTITIES, DEFAULT_PROBLEMATIC_TILE_ENTITIES, DEFAULT_PROBLEMATIC_ITEMS
+    )
+
+    rules = {}
+    if rules_file:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+
+    return (rules.get("entities", DEFAULT_PROBLEMATIC_ENTITIES),
+            rules.get("tile_entities", DEFAULT_PROBLEMATIC_TILE_ENTITIES),
+            rules.get("items", DEFAULT_PROBLEMATIC_ITEMS))
+
+
+def _playerdata_cache_file(args):
+    """返回玩家数据缓存文件路径，未指定缓存目录时返回None（保存在输出目录中）"""
+    if not args.cache_dir:
+        return None
+    os.makedirs(args.cache_dir, exist_ok=True)
+    return os.path.join(args.cache_dir, "playerdata_cache.json")
+
+
+def cmd_analyze(args):
+    """analyze子命令：分析区域文件中的区块、实体和方块实体"""
+    from mc_save_analyzer import analyze_multiple_mca_files
+
+    try:
+        chunk_filter = _build_chunk_filter(args)
+    except (OSError, ValueError) as e:
+        print(f"读取区块列表时出错: {e}")
+        return 1
+
+    success = analyze_multiple_mca_files(
+        args.save_dir, args.output_dir, max_files=args.max_files, deep_scan=args.deep_scan,
+        all_dimensions=args.all_dimensions, workers=args.workers, stream=args.stream,
+        chunk_filter=chunk_filter, show_progress=not args.no_progress, pretty=args.pretty
+    )
+    if not success:
+        return 1
+
+    print("\n所有分析任务完成！")
+    return 0
+
+
+def cmd_extract(args):
+    """extract子命令：提取区域文件中的方块数据"""
+    from mc_block_extractor import extract_blocks_from_region_files
+
+    try:
+        chunk_filter = _build_chunk_filter(args)
+    except (OSError, ValueError) as e:
+        print(f"读取区块列表时出错: {e}")
+        return 1
+
+    success = extract_blocks_from_region_files(
+        args.save_dir, args.output_dir, all_dimensions=args.all_dimensions, workers=args.workers,
+        stream=args.stream, chunk_filter=chunk_filter, show_progress=not args.no_progress,
+        pretty=args.pretty
+    )
+    if not success:
+        print("\n方块数据提取任务失败！")
+        return 1
+
+    print("\n方块数据提取任务完成！")
+    return 0
+
+
+def cmd_upgrade_check(args):
+    """upgrade-check子命令：查找升级时可能有问题的区块并生成备份建议"""
+    from mc_save_upgrade_helper import MinecraftSaveUpgradeHelper
+
+    entities, tile_entities, items = _load_upgrade_rules(args.rules)
+
+    try:
+        chunk_filter = _build_chunk_filter(args)
+    except (OSError, ValueError) as e:
+        print(f"读取区块列表时出错: {e}")
+        return 1
+
+    upgrade_helper = MinecraftSaveUpgradeHelper(args.save_dir, args.output_dir, pretty_json=args.pretty)
+    upgrade_helper.set_problematic_entities(entities)
+    upgrade_helper.set_problematic_tile_entities(tile_entities)
+    upgrade_helper.set_problematic_items(items)
+
+    print("开始分析存档以准备升级...")
+    success = upgrade_helper.analyze_save(
+        max_files=args.max_files, all_dimensions=args.all_dimensions, workers=args.workers,
+        deep_scan=args.deep_scan, chunk_filter=chunk_filter, show_progress=not args.no_progress,
+        resume=args.resume
+    )
+    if not success:
+        return 1
+
+    if args.playerdata:
+        from mc_playerdata_analyzer import MCPlayerDataAnalyzer
+
+        analyzer = MCPlayerDataAnalyzer(args.save_dir, os.path.join(args.output_dir, "playerdata"),
+                                        cache_file=_playerdata_cache_file(args))
+        analyzer.set_problematic_items(items)
+        print("\n开始分析玩家数据...")
+        if analyzer.analyze(workers=args.workers):
+            analyzer.generate_report(args.pretty)
+
+    # 生成备份建议
+    upgrade_helper.recommend_backup_strategy()
+
+    print(f"\n分析完成！请查看{args.output_dir}目录中的报告。")
+    return 0
+
+
+def cmd_playerdata(args):
+    """playerdata子命令：统计玩家背包和末影箱中的物品"""
+    from mc_playerdata_analyzer import MCPlayerDataAnalyzer
+
+    _, _, items = _load_upgrade_rules(args.rules)
+
+    analyzer = MCPlayerDataAnalyzer(args.save_dir, args.output_dir,
+                                    cache_file=_playerdata_cache_file(args))
+    analyzer.set_problematic_items(items)
+
+    print("开始分析玩家数据...")
+    if not analyzer.analyze(workers=args.workers):
+        return 1
+    analyzer.generate_report(args.pretty)
+
+    print("\n分析完成！")
+    return 0
+
+
+def cmd_diff(args):
+    """diff子命令：比较两个存档中区块的实体和方块实体"""
+    from mc_world_diff import MCWorldDiff
+
+    world_diff = MCWorldDiff(args.old_save_dir, args.new_save_dir, args.output_dir,
+                             trust_timestamps=not args.no_trust_timestamps)
+
+    print("开始比较存档...")
+    if not world_diff.compare_worlds(args.max_files):
+        return 1
+    world_diff.save_report(pretty=args.pretty)
+
+    print("\n比较完成！")
+    return 0
+
+
+def cmd_compact(args):
+    """compact子命令：紧密重写区域文件以回收空闲扇区"""
+    from mc_region_writer import compact_region_files
+
+    results = compact_region_files(args.save_dir, compression_level=args.compression_level,
+                                   max_files=args.max_files, all_dimensions=args.all_dimensions)
+    if not results:
+        return 1
+
+    print("\n所有整理任务完成！")
+    return 0
+
+
+def cmd_prune(args):
+    """prune子命令：按问题区块列表或规则批量删除区块"""
+    from mc_chunk_pruner import MCChunkPruner
+    from mc_world_walker import OVERWORLD
+
+    if not args.issues_report and not args.rule:
+        print("请通过 --issues-report 或 --rule 指定要删除的区块")
+        return 1
+
+    pruner = MCChunkPruner(args.save_dir, compression_level=args.compression_level,
+                           dry_run=not args.apply)
+
+    # 只使用明确给出的报告，避免误用当前目录中旧的分析结果
+    if args.issues_report:
+        if not os.path.exists(args.issues_report):
+            print(f"找不到问题区块报告: {args.issues_report}")
+            return 1
+        pruner.load_issues_from_report(args.issues_report)
+
+    if args.rule:
+        try:
+            pruner.set_rule(args.rule, dimensions=None if args.all_dimensions else (OVERWORLD,))
+        except ValueError as e:
+            print(str(e))
+            return 1
+
+    if not pruner.prune(args.max_files):
+        return 1
+    pruner.save_report(args.output_dir, args.pretty)
+    return 0
+
+
+def cmd_parse_log(args):
+    """parse-log子命令：解析方块信息日志并保存为JSON"""
+    from mc_block_parser import parse_blocks_info_log, save_to_json
+
+    print(f"开始解析Minecraft方块信息...")
+    try:
+        blocks_data = parse_blocks_info_log(args.input_file)
+        save_to_json(blocks_data, args.output_file)
+    except Exception as e:
+        print(f"处理过程中出现错误: {e}")
+        return 1
+
+    print(f"解析完成! 共处理了 {len(blocks_data)} 个方块，数据已保存到 {args.output_file}")
+    return 0
+
+
+def cmd_textures(args):
+    """textures子命令：按区域文件统计方块贴图和渲染类型"""
+    from mc_texture_analyzer import MCTextureAnalyzer
+
+    analyzer = MCTextureAnalyzer(args.blocks_data, args.output_dir, top_n=args.top)
+    if not analyzer.analyze(args.extract_dir):
+        return 1
+    analyzer.generate_report(pretty=args.pretty)
+
+    print("\n贴图分析完成！")
+    return 0
+
+
+def cmd_benchmark(args):
+    """benchmark子命令：在合成数据上测量各阶段性能并与基准比较"""
+    from mc_benchmark import MCBenchmark, load_baseline
+
+    stages = args.stages.split(",") if args.stages else None
+    benchmark = MCBenchmark(args.regions, args.chunks_per_region, args.log_blocks,
+                            repeat=args.repeat, fixture_dir=args.fixture_dir)
+    results = benchmark.run(stages) if stages else benchmark.run()
+    if results is None:
+        return 1
+
+    if args.output:
+        benchmark.save_baseline(args.output, args.pretty)
+
+    try:
+        baseline = None if args.update_baseline else load_baseline(args.baseline)
+    except (OSError, ValueError) as e:
+        print(f"读取基准文件 {args.baseline} 时出错: {e}")
+        return 1
+
+    if baseline is None:
+        benchmark.save_baseline(args.baseline, args.pretty)
+        return 0
+
+    if not benchmark.compare(baseline, args.max_slowdown, args.max_memory_growth):
+        return 1
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="mc_cli.py",
+        description="Minecraft存档分析与升级工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="<子命令>")
+    subparsers.required = True
+
+    # 输出JSON报告的子命令共用的参数
+    report_parser = argparse.ArgumentParser(add_help=False)
+    report_parser.add_argument("--pretty", action="store_true",
+                               help="JSON报告使用缩进格式（默认输出紧凑JSON）")
+
+    # analyze
+    sub = subparsers.add_parser("analyze", parents=[report_parser], help="分析区域文件中的区块、实体和方块实体")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="analysis_results", help="输出目录 (默认: analysis_results)")
+    sub.add_argument("--max-files", type=int, help="只分析最大的N个区域文件")
+    sub.add_argument("--all-dimensions", action="store_true", help="分析所有维度")
+    sub.add_argument("--deep-scan", action="store_true", help="扫描方块实体物品栏中的物品")
+    _add_performance_arguments(sub)
+    sub.set_defaults(func=cmd_analyze)
+
+    # extract
+    sub = subparsers.add_parser("extract", parents=[report_parser], help="提取区域文件中的方块数据")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="extracted_blocks", help="输出目录 (默认: extracted_blocks)")
+    sub.add_argument("--all-dimensions", action="store_true", help="处理所有维度")
+    _add_performance_arguments(sub)
+    sub.set_defaults(func=cmd_extract)
+
+    # upgrade-check
+    sub = subparsers.add_parser("upgrade-check", parents=[report_parser], help="查找升级时可能有问题的区块并生成备份建议")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="upgrade_analysis", help="输出目录 (默认: upgrade_analysis)")
+    sub.add_argument("--rules", help="问题ID规则JSON文件，包含entities、tile_entities、items列表")
+    sub.add_argument("--max-files", type=int, help="只分析最大的N个区域文件")
+    sub.add_argument("--all-dimensions", action="store_true", help="分析所有维度")
+    sub.add_argument("--deep-scan", action="store_true", help="扫描方块实体物品栏中的问题物品")
+    sub.add_argument("--playerdata", action="store_true", help="同时分析玩家数据中的问题物品")
+    sub.add_argument("--resume", action="store_true",
+                     help="从上次中断的扫描继续，跳过检查点中已完成且未修改的区域文件")
+    _add_performance_arguments(sub, stream=False, cache=True)
+    sub.set_defaults(func=cmd_upgrade_check)
+
+    # playerdata
+    sub = subparsers.add_parser("playerdata", parents=[report_parser], help="统计玩家背包和末影箱中的物品")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="playerdata_analysis", help="输出目录 (默认: playerdata_analysis)")
+    sub.add_argument("--rules", help="问题ID规则JSON文件，使用其中的items列表")
+    sub.add_argument("-j", "--workers", type=int, help="进程数 (默认: 全部CPU核心)")
+    sub.add_argument("--cache-dir", help="缓存文件目录 (默认: 输出目录)")
+    sub.set_defaults(func=cmd_playerdata)
+
+    # diff
+    sub = subparsers.add_parser("diff", parents=[report_parser], help="比较两个存档中区块的实体和方块实体")
+    sub.add_argument("old_save_dir", nargs="?", default="save_world_backup", help="旧存档目录 (默认: save_world_backup)")
+    sub.add_argument("new_save_dir", nargs="?", default="save_world", help="新存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="world_diff", help="输出目录 (默认: world_diff)")
+    sub.add_argument("--max-files", type=int, help="只比较前N个区域文件")
+    sub.add_argument("--no-trust-timestamps", action="store_true", help="不根据头部时间戳跳过区块")
+    sub.set_defaults(func=cmd_diff)
+
+    # compact
+    sub = subparsers.add_parser("compact", help="紧密重写区域文件以回收空闲扇区（请先备份）")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("--compression-level", type=int, choices=range(0, 10), metavar="0-9",
+                     help="以指定的zlib级别重新压缩区块")
+    sub.add_argument("--max-files", type=int, help="只整理前N个区域文件")
+    sub.add_argument("--all-dimensions", action="store_true", help="整理所有维度")
+    sub.set_defaults(func=cmd_compact)
+
+    # prune
+    sub = subparsers.add_parser("prune", parents=[report_parser], help="按问题区块列表或规则批量删除区块（默认只预演）")
+    sub.add_argument("save_dir", nargs="?", default="save_world", help="存档目录 (默认: save_world)")
+    sub.add_argument("-o", "--output-dir", default="prune_results", help="输出目录 (默认: prune_results)")
+    sub.add_argument("--issues-report",
+                     help="升级分析的JSON报告或问题区块列表(.jsonl)，删除其中的问题区块")
+    sub.add_argument("--rule", help='删除规则，如 "InhabitedTime < 200 and no tile entities"')
+    sub.add_argument("--all-dimensions", action="store_true", help="删除规则适用于所有维度")
+    sub.add_argument("--compression-level", type=int, choices=range(0, 10), metavar="0-9",
+                     help="以指定的zlib级别重新压缩保留的区块")
+    sub.add_argument("--max-files", type=int, help="只处理前N个区域文件")
+    sub.add_argument("--apply", action="store_true", help="实际修改区域文件（默认只预演）")
+    sub.set_defaults(func=cmd_prune)
+
+    # parse-log
+    sub = subparsers.add_parser("parse-log", help="解析方块信息日志并保存为JSON")
+    sub.add_argument("input_file", nargs="?", default="blocks_info.log", help="日志文件 (默认: blocks_info.log)")
+    sub.add_argument("-o", "--output-file", default="blocks_data.json", help="输出文件 (默认: blocks_data.json)")
+    sub.set_defaults(func=cmd_parse_log)
+
+    # textures
+    sub = subparsers.add_parser("textures", parents=[report_parser],
+                                help="关联方块提取结果与贴图数据，统计贴图和渲染类型")
+    sub.add_argument("extract_dir", nargs="?", default="extracted_blocks",
+                     help="extract子命令的输出目录 (默认: extracted_blocks)")
+    sub.add_argument("--blocks-data", default="blocks_data.json",
+                     help="parse-log生成的方块贴图数据 (默认: blocks_data.json)")
+    sub.add_argument("-o", "--output-dir", default="texture_analysis", help="输出目录 (默认: texture_analysis)")
+    sub.add_argument("--top", type=int, default=10, help="每个区域文件报告的贴图和方块数量 (默认: 10)")
+    sub.set_defaults(func=cmd_textures)
+
+    # benchmark
+    sub = subparsers.add_parser("benchmark", parents=[report_parser],
+                                help="在合成数据上测量分析、提取和日志解析的性能并与基准比较")
+    sub.add_argument("--baseline", default="benchmark_baseline.json",
+                     help="基准结果文件，不存在时保存本次结果为基准 (默认: benchmark_baseline.json)")
+    sub.add_argument("--update-baseline", action="store_true", help="不比较，直接用本次结果覆盖基准")
+    sub.add_argument("--max-slowdown", type=float, default=15.0,
+                     help="允许的吞吐量下降百分比 (默认: 15)")
+    sub.add_argument("--max-memory-growth", type=float, default=20.0,
+                     help="允许的峰值内存增长百分比 (默认: 20)")
+    sub.add_argument("--stages", type=_parse_stages, metavar="阶段,...",
+                     help="只运行指定阶段: analyze,extract,parse-log (默认: 全部)")
+    sub.add_argument("--repeat", type=_parse_repeat, default=3,
+                     help="每个阶段计时的运行次数（至少3次），取中位数 (默认: 3)")
+    sub.add_argument("--regions", type=int, default=2, help="合成区域文件数 (默认: 2)")
+    sub.add_argument("--chunks-per-region", type=int, default=256, help="每个合成区域文件的区块数 (默认: 256)")
+    sub.add_argument("--log-blocks", type=int, default=2000, help="合成方块信息日志中的方块数 (默认: 2000)")
+    sub.add_argument("--fixture-dir", help="保留合成数据的目录 (默认: 临时目录，运行后删除)")
+    sub.add_argument("--output", help="另外把本次结果保存到此文件")
+    sub.set_defaults(func=cmd_benchmark)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import amulet_nbt as nbt
+from itertools import repeat
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from mc_save_upgrade_helper import is_problematic_id
+from mc_inventory_scanner import scan_inventory, load_item_registry, registry_digest
+from mc_report_writer import write_json, write_top_stats, REPORT_TOP_N
+
+# 缓存文件格式版本，结果结构变化时递增以使旧缓存失效
+CACHE_VERSION = 3
+
+
+def load_player_file(path, item_names=None):
+    """
+    读取单个玩家数据文件或level.dat（gzip压缩的NBT）并统计其中的物品
+
+    item_names为{数字ID: 注册名}，数字物品ID按其换算为注册名；
+    在工作进程中执行，返回{"item_stats": {物品ID: 数量}, "error": 错误信息或None}
+    """
+    item_stats = defaultdict(int)
+    try:
+        player = nbt.load(path).tag
+
+        # level.dat中单人游戏的玩家数据位于Data.Player
+        if "Data" in player:
+            player = player["Data"].get("Player")
+            if player is None:
+                return {"item_stats": {}, "error": None}
+
+        # 背包和末影箱，包括背包类物品中嵌套的物品
+        scan_inventory(player, item_stats, item_names)
+
+        return {"item_stats": dict(item_stats), "error": None}
+    except Exception as e:
+        return {"item_stats": {}, "error": str(e)}
+
+
+class MCPlayerDataAnalyzer:
+    """
+    玩家数据批量分析工具类
+    使用进程池并行读取level.dat和playerdata/*.dat（以及1.7.10之前的players/*.dat），
+    统计玩家背包和末影箱中的物品ID（包括嵌套物品），结果按文件修改时间缓存，再次运行时只读取变化的文件
+    """
+
+    def __init__(self, save_dir, output_dir="playerdata_analysis", cache_file=None):
+        """初始化分析器，cache_file为None时缓存保存在输出目录中"""
+        self.save_dir = save_dir
+        self.output_dir = output_dir
+        self.cache_file = cache_file or os.path.join(output_dir, "playerdata_cache.json")
+
+        # 确保输出目录存在
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # 分析结果
+        self.problematic_item_types = []
+        self.item_stats = defaultdict(int)
+        self.players_with_issues = []
+        self.analyzed_files = 0
+        self.cached_files = 0
+        self.error_count = 0
+        self.item_names = {}
+
+    def set_problematic_items(self, item_list):
+        """设置可能在升级中有问题的物品ID"""
+        self.problematic_item_types = item_list
+
+    def find_player_files(self):
+        """查找存档中所有需要分析的玩家数据文件"""
+        files = []
+        level_dat = os.path.join(self.save_dir, "level.dat")
+        if os.path.exists(level_dat):
+            files.append(level_dat)
+
+        for folder in ("playerdata", "players"):
+            player_dir = os.path.join(self.save_dir, folder)
+            if os.path.isdir(player_dir):
+                files.extend(os.path.join(player_dir, f) for f in sorted(os.listdir(player_dir))
+                             if f.endswith(".dat"))
+        return files
+
+    def _load_cache(self):
+        """读取缓存，缓存不存在、格式不符或物品ID表已变化时返回空字典"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION and cache.get("registry") == registry_digest(self.item_names):
+                return cache.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_cache(self, cache_files):
+        """原子地写出缓存"""
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": CACHE_VERSION, "registry": registry_digest(self.item_names), "files": cache_files},
+                      f, ensure_ascii=False)
+        os.replace(temp_file, self.cache_file)
+
+    def analyze(self, workers=None):
+        """
+        分析所有玩家数据文件
+
+        workers为进程数，None表示使用全部CPU核心；修改时间和大小都未变化的文件直接使用缓存结果；
+        1.7.10存档中的数字物品ID按level.dat中FML.ItemData的ID表换算为注册名
+        """
+        player_files = self.find_player_files()
+        if not player_files:
+            print(f"在 {self.save_dir} 中找不到玩家数据文件")
+            return False
+
+        self.item_names = load_item_registry(self.save_dir)
+        if self.item_names:
+            print(f"从level.dat读取了 {len(self.item_names)} 个物品的ID表")
+
+        cache = self._load_cache()
+        new_cache = {}
+        results = {}
+        pending = []
+
+        for path in player_files:
+            stat = os.stat(path)
+            cached = cache.get(path)
+            if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+                results[path] = cached["result"]
+                new_cache[path] = cached
+                self.cached_files += 1
+            else:
+                pending.append((path, stat))
+
+        print(f"找到 {len(player_files)} 个玩家数据文件，其中 {len(pending)} 个需要读取...")
+
+        start_time = time.time()
+        if pending:
+            paths = [path for path, _ in pending]
+            if workers == 1 or len(pending) == 1:
+                loaded = [load_player_file(path, self.item_names) for path in paths]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # 玩家文件通常很小，批量分发以减少进程间通信开销
+                    loaded = list(executor.map(load_player_file, paths, repeat(self.item_names),
+                                               chunksize=64))
+
+            for (path, stat), result in zip(pending, loaded):
+                results[path] = result
+                # 读取失败的文件不缓存，下次运行时重试
+                if result["error"] is None:
+                    new_cache[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "result": result}
+
+        elapsed_time = time.time() - start_time
+        print(f"  读取完成，耗时: {elapsed_time:.2f}秒")
+
+        self._save_cache(new_cache)
+
+        # 汇总结果
+        for path in player_files:
+            self._merge_player_result(path, results[path])
+
+        return True
+
+    def _merge_player_result(self, path, result):
+        """合并单个玩家文件的结果"""
+        if result["error"] is not None:
+            self.error_count += 1
+            print(f"读取 {path} 时出错: {result['error']}")
+            return
+
+        self.analyzed_files += 1
+        problematic_items = {}
+        for item_id, count in result["item_stats"].items():
+            self.item_stats[item_id] += count
+            if is_problematic_id(item_id, self.problematic_item_types):
+                problematic_items[item_id] = count
+
+        if problematic_items:
+            self.players_with_issues.append({
+                "file": os.path.relpath(path, self.save_dir),
+                "problematic_items": problematic_items
+            })
+
+    def get_results(self):
+        """获取分析结果"""
+        return {
+            "save_directory": self.save_dir,
+            "analyzed_files": self.analyzed_files,
+            "cached_files": self.cached_files,
+            "error_count": self.error_count,
+            "item_stats": dict(self.item_stats),
+            "problematic_item_types": self.problematic_item_types,
+            "players_with_issues": self.players_with_issues
+        }
+
+    def generate_report(self, pretty=False):
+        """生成玩家物品分析报告，pretty为True时JSON报告使用缩进格式"""
+        report_file = os.path.join(self.output_dir, "playerdata_report.txt")
+        json_file = os.path.join(self.output_dir, "playerdata_report.json")
+
+        report_data = self.get_results()
+        report_data["analysis_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 保存JSON报告
+        write_json(json_file, report_data, pretty)
+
+        # 保存文本报告
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write("Minecraft玩家物品分析报告\n")
+            f.write("======================\n\n")
+            f.write(f"存档目录: {self.save_dir}\n")
+            f.write(f"分析时间: {report_data['analysis_time']}\n")
+            f.write(f"玩家文件数: {self.analyzed_files} (其中 {self.cached_files} 个来自缓存)\n")
+            f.write(f"错误次数: {self.error_count}\n\n")
+
+            f.write("物品统计:\n")
+            write_top_stats(f, self.item_stats, annotate=lambda item_id: (
+                " (可能有问题)" if is_problematic_id(item_id, self.problematic_item_types) else ""))
+            f.write("\n")
+
+            if self.players_with_issues:
+                f.write(f"发现 {len(self.players_with_issues)} 个玩家携带可能存在升级问题的物品:\n")
+                for i, player in enumerate(self.players_with_issues[:REPORT_TOP_N]):  # 限制显示100个
+                    f.write(f"  {i+1}. 文件: {player['file']}\n")
+                    for item_id, count in player["problematic_items"].items():
+                        f.write(f"     - {item_id}: {count}\n")
+
+                if len(self.players_with_issues) > REPORT_TOP_N:
+                    f.write(f"  ... 还有 {len(self.players_with_issues) - REPORT_TOP_N} 个玩家 (查看JSON文件获取完整列表)\n")
+            else:
+                f.write("未发现携带问题物品的玩家\n")
+
+        print(f"玩家物品报告已保存到 {report_file} 和 {json_file}")
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py playerdata 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["playerdata"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+长时间扫描的进度、吞吐量和错误汇报
+
+- ProgressCounter：已处理字节数、区块数和错误数的计数器，保存在共享内存中，
+  工作进程先在本地累加，每隔一段时间才加锁写入一次，开销可以忽略；
+  错误和提示消息也先在本地按类别计数，随计数一起通过消息队列发送给主进程
+- ProgressReporter：主进程中的后台线程，按固定间隔输出已处理字节、区块/秒、预计剩余时间和错误总数，
+  并输出各进程发来的消息
+- ErrorLog：按错误类别限流，每类只输出前几条，其余只计数并定期汇总输出，避免损坏的存档刷屏；
+  启用共享计数器时只有主进程的ProgressReporter持有一个ErrorLog，限流对所有工作进程整体生效
+
+区域文件读取代码通过current_counter()和report_error()使用当前进程的计数器，
+未安装共享计数器时计数为空操作，消息直接由本进程的ErrorLog限流输出。
+"""
+
+import sys
+import time
+import threading
+import multiprocessing
+
+# 进度输出间隔（秒）
+DEFAULT_REPORT_INTERVAL = 5.0
+
+# 工作进程把本地计数写入共享内存的最小间隔（秒）
+COUNTER_FLUSH_INTERVAL = 0.5
+
+# 进度汇报线程读取消息队列的间隔（秒）
+MESSAGE_POLL_INTERVAL = 0.5
+
+# 每类错误最多完整输出的条数，以及被省略的错误汇总输出的间隔（秒）
+MAX_ERRORS_PER_KIND = 5
+ERROR_SUMMARY_INTERVAL = 30.0
+
+# 共享计数器中各项的位置
+_BYTES, _CHUNKS, _ERRORS = range(3)
+
+
+def format_bytes(num_bytes):
+    """把字节数格式化为易读的字符串"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def format_duration(seconds):
+    """把秒数格式化为"1小时02分03秒"形式"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}小时{minutes:02d}分{seconds:02d}秒"
+    if minutes:
+        return f"{minutes}分{seconds:02d}秒"
+    return f"{seconds}秒"
+
+
+def create_shared_counter():
+    """
+    创建跨进程共享的计数数组和消息队列
+
+    返回(shared, messages)，在主进程中创建后作为install_counter的参数传给各工作进程
+    """
+    return multiprocessing.Array('q', 3), multiprocessing.SimpleQueue()
+
+
+class ProgressCounter:
+    """
+    跨进程共享的进度计数器
+    在主进程中创建，通过进程池的initializer传给工作进程（见install_counter）
+    """
+
+    def __init__(self, shared=None, messages=None, max_per_kind=MAX_ERRORS_PER_KIND):
+        """
+        shared为None时创建新的共享数组；
+        messages为create_shared_counter()创建的消息队列，为None时消息直接在本进程中输出
+        """
+        self.shared = shared if shared is not None else multiprocessing.Array('q', 3)
+        self.messages = messages
+        self.max_per_kind = max_per_kind
+        self._pending = [0, 0, 0]
+        self._pending_messages = {}
+        self._sent_per_kind = {}
+        self._last_flush = time.monotonic()
+
+    def add(self, bytes_read=0, chunks=0, errors=0):
+        """累加计数，只在距上次写入超过COUNTER_FLUSH_INTERVAL时才加锁写入共享内存"""
+        pending = self._pending
+        pending[_BYTES] += bytes_read
+        pending[_CHUNKS] += chunks
+        pending[_ERRORS] += errors
+        if time.monotonic() - self._last_flush >= COUNTER_FLUSH_INTERVAL:
+            self.flush()
+
+    def log(self, kind, message):
+        """记录一条消息，随下次flush发送给主进程统一限流输出"""
+        if self.messages is None:
+            _error_log.report(kind, message)
+            return
+
+        pending = self._pending_messages.get(kind)
+        if pending is None:
+            pending = self._pending_messages[kind] = [0, []]
+        pending[0] += 1
+        # 本进程已发送的条数达到上限时，所有进程合计也一定达到上限，之后只需发送计数
+        sent = self._sent_per_kind.get(kind, 0)
+        if sent < self.max_per_kind:
+            pending[1].append(message)
+            self._sent_per_kind[kind] = sent + 1
+        if time.monotonic() - self._last_flush >= COUNTER_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """把本地累加的计数写入共享内存，并把待输出的消息发送给主进程"""
+        pending = self._pending
+        if pending[_BYTES] or pending[_CHUNKS] or pending[_ERRORS]:
+            with self.shared.get_lock():
+                self.shared[_BYTES] += pending[_BYTES]
+                self.shared[_CHUNKS] += pending[_CHUNKS]
+                self.shared[_ERRORS] += pending[_ERRORS]
+            self._pending = [0, 0, 0]
+        if self._pending_messages:
+            self.messages.put(self._pending_messages)
+            self._pending_messages = {}
+        self._last_flush = time.monotonic()
+
+    def read(self):
+        """返回(已处理字节数, 区块数, 错误数)"""
+        with self.shared.get_lock():
+            return tuple(self.shared[:])
+
+
+class _NullCounter:
+    """未启用进度汇报时使用的空计数器"""
+
+    def add(self, bytes_read=0, chunks=0, errors=0):
+        pass
+
+    def log(self, kind, message):
+        _error_log.report(kind, message)
+
+    def flush(self):
+        pass
+
+
+_NULL_COUNTER = _NullCounter()
+_current_counter = _NULL_COUNTER
+
+
+def install_counter(shared, messages=None):
+    """
+    在当前进程中启用共享计数器（作为进程池的initializer调用）
+
+    参数为create_shared_counter()的返回值，shared为None时恢复为空计数器；
+    替换前先写出原计数器中尚未写入的计数和消息
+    """
+    global _current_counter
+    _current_counter.flush()
+    _current_counter = ProgressCounter(shared, messages) if shared is not None else _NULL_COUNTER
+
+
+def current_counter():
+    """返回当前进程的计数器"""
+    return _current_counter
+
+
+class ErrorLog:
+    """
+    按类别限流的错误日志
+    每类错误只完整输出前max_per_kind条，其余只计数，每隔summary_interval秒汇总输出一次
+    """
+
+    def __init__(self, max_per_kind=MAX_ERRORS_PER_KIND, summary_interval=ERROR_SUMMARY_INTERVAL):
+        self.max_per_kind = max_per_kind
+        self.summary_interval = summary_interval
+        self.counts = {}
+        self.suppressed = {}
+        self._last_summary = time.monotonic()
+
+    def report(self, kind, message):
+        """记录一条消息，kind为错误类别（如"处理区块时出错"）"""
+        self.record(kind, 1, [message])
+
+    def record(self, kind, count, messages):
+        """记录同一类别的count条消息，messages为其中最先出现的若干条的内容"""
+        shown = self.counts.get(kind, 0)
+        self.counts[kind] = shown + count
+        for message in messages[:max(self.max_per_kind - shown, 0)]:
+            print(message)
+            shown += 1
+            count -= 1
+            if shown == self.max_per_kind:
+                print(f"  ({kind} 已输出 {shown} 条，后续同类消息将汇总显示)")
+
+        if count > 0:
+            self.suppressed[kind] = self.suppressed.get(kind, 0) + count
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """距上次汇总超过summary_interval秒时输出被省略的消息数量"""
+        if self.suppressed and time.monotonic() - self._last_summary >= self.summary_interval:
+            self.flush()
+
+    def flush(self):
+        """输出被省略的消息数量"""
+        for kind, count in self.suppressed.items():
+            print(f"  ({kind}: 另有 {count} 条未显示，累计 {self.counts[kind]} 条)")
+        self.suppressed = {}
+        self._last_summary = time.monotonic()
+
+
+_error_log = ErrorLog()
+
+
+def report_error(kind, message):
+    """限流输出一条错误并计入进度计数器的错误总数"""
+    _current_counter.add(errors=1)
+    _current_counter.log(kind, message)
+
+
+def report_notice(kind, message):
+    """限流输出一条提示（不计入错误总数）"""
+    _current_counter.log(kind, message)
+
+
+def flush_messages():
+    """
+    把本地计数和待输出的消息发送给主进程（每个区域文件处理结束时调用）
+
+    被省略的消息数量仍由主进程按ERROR_SUMMARY_INTERVAL汇总输出
+    """
+    _current_counter.flush()
+
+
+class ProgressReporter:
+    """
+    进度汇报线程
+    在主进程中按固定间隔读取共享计数器并输出一行进度，同时输出各进程发来的消息，
+    show_progress为False时只输出消息
+    """
+
+    def __init__(self, counter, total_bytes, total_files, interval=DEFAULT_REPORT_INTERVAL, stream=None,
+                 show_progress=True):
+        self.counter = counter
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.show_progress = show_progress
+        self.error_log = ErrorLog()
+        self.files_done = 0
+        self._start_time = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """开始定期汇报"""
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="progress-reporter", daemon=True)
+        self._thread.start()
+
+    def file_done(self):
+        """记录完成一个区域文件（在主进程中调用）"""
+        self.files_done += 1
+
+    def stop(self):
+        """停止汇报，输出剩余的消息和最终统计"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.counter.flush()
+        self.drain_messages()
+        self.error_log.flush()
+        if self.show_progress:
+            self.report(final=True)
+
+    def _run(self):
+        next_report = time.monotonic() + self.interval
+        while not self._stop_event.wait(MESSAGE_POLL_INTERVAL):
+            self.drain_messages()
+            if self.show_progress and time.monotonic() >= next_report:
+                self.report()
+                next_report += self.interval
+
+    def drain_messages(self):
+        """输出各进程发来的消息，并按间隔汇总被省略的消息数量"""
+        messages = self.counter.messages
+        if messages is not None:
+            while not messages.empty():
+                for kind, (count, texts) in messages.get().items():
+                    self.error_log.record(kind, count, texts)
+        self.error_log.flush_if_due()
+
+    def report(self, final=False):
+        """输出一行进度"""
+        bytes_done, chunks_done, errors = self.counter.read()
+        elapsed = max(time.monotonic() - self._start_time, 1e-6)
+        byte_rate = bytes_done / elapsed
+
+        parts = [f"文件 {self.files_done}/{self.total_files}"]
+        if self.total_bytes:
+            percent = min(bytes_done / self.total_bytes, 1.0) * 100
+            parts.append(f"{format_bytes(bytes_done)}/{format_bytes(self.total_bytes)} ({percent:.1f}%)")
+        parts.append(f"{chunks_done / elapsed:.0f} 区块/秒")
+        parts.append(f"{format_bytes(byte_rate)}/秒")
+        if final:
+            parts.append(f"用时 {format_duration(elapsed)}")
+        elif byte_rate > 0 and self.total_bytes:
+            parts.append(f"预计剩余 {format_duration(max(self.total_bytes - bytes_done, 0) / byte_rate)}")
+        parts.append(f"错误 {errors}")
+
+        prefix = "[完成]" if final else "[进度]"
+        print(f"{prefix} " + " | ".join(parts), file=self.stream, flush=True)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Minecraft区域文件(.mca)底层读取工具
+
+提供区域文件头部（位置表与时间戳表）的解析、单个区块原始数据的读取以及解压，
+供分析、比较等上层工具共用，本模块不依赖amulet-nbt。
+"""
+
+import os
+import struct
+import gzip
+import zlib
+from collections import namedtuple
+
+# 区域文件以4096字节为一个扇区，头部占前两个扇区
+SECTOR_SIZE = 4096
+HEADER_SIZE = 8192
+CHUNKS_PER_REGION = 1024
+
+# 区块压缩类型
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+
+# 头部中的一个区块条目
+ChunkEntry = namedtuple("ChunkEntry", [
+    "chunk_index",    # 区块在区域内的序号 (0-1023)
+    "chunk_x",        # 区块绝对X坐标
+    "chunk_z",        # 区块绝对Z坐标
+    "sector_offset",  # 起始扇区
+    "sector_count",   # 占用扇区数
+    "timestamp"       # 最后修改时间戳
+])
+
+
+def parse_region_coords(file_name):
+    """从r.X.Z.mca文件名中解析区域坐标，无法解析时返回(0, 0)"""
+    try:
+        parts = os.path.basename(file_name).replace('r.', '').replace('.mca', '').split('.')
+        return int(parts[0]), int(parts[1])
+    except (ValueError, IndexError):
+        return 0, 0
+
+
+def read_region_header(mca_file, region_x=0, region_z=0):
+    """
+    解析已打开的区域文件头部
+
+    返回按区块序号排列的ChunkEntry列表，不存在的区块不会出现在列表中
+    """
+    mca_file.seek(0)
+    header_data = mca_file.read(HEADER_SIZE)
+    if len(header_data) < HEADER_SIZE:
+        # 空文件或头部被截断的文件视为不含任何区块
+        return []
+
+    locations = struct.unpack('>1024I', header_data[:SECTOR_SIZE])
+    timestamps = struct.unpack('>1024I', header_data[SECTOR_SIZE:])
+
+    entries = []
+    for chunk_index in range(CHUNKS_PER_REGION):
+        location = locations[chunk_index]
+        sector_count = location & 0xFF
+        if sector_count > 0:  # 区块存在
+            entries.append(ChunkEntry(
+                chunk_index,
+                (region_x * 32) + (chunk_index % 32),
+                (region_z * 32) + (chunk_index // 32),
+                location >> 8,
+                sector_count,
+                timestamps[chunk_index]
+            ))
+    return entries
+
+
+def read_region_entries(mca_file_path):
+    """打开区域文件并返回其头部中的所有区块条目"""
+    region_x, region_z = parse_region_coords(mca_file_path)
+    with open(mca_file_path, 'rb') as mca_file:
+        return read_region_header(mca_file, region_x, region_z)
+
+
+def read_chunk_payload(mca_file, entry):
+    """
+    读取单个区块的原始数据
+
+    返回(compression_type, compressed_data)，区块长度为0时返回(None, b"")
+    """
+    mca_file.seek(entry.sector_offset * SECTOR_SIZE)
+    length = struct.unpack('>I', mca_file.read(4))[0]
+    if length == 0:
+        return None, b""
+    compression_type = struct.unpack('B', mca_file.read(1))[0]
+    compressed_data = mca_file.read(length - 1)
+    return compression_type, compressed_data
+
+
+def decompress_chunk(compression_type, compressed_data):
+    """按压缩类型解压区块数据，未知压缩类型抛出ValueError"""
+    if compression_type == COMPRESSION_GZIP:
+        return gzip.decompress(compressed_data)
+    if compression_type == COMPRESSION_ZLIB:
+        return zlib.decompress(compressed_data)
+    raise ValueError(f"未知的压缩类型 {compression_type}")
+
+
+def list_region_files(region_dir):
+    """列出目录中的所有.mca文件名，目录不存在时返回空列表"""
+    if not os.path.isdir(region_dir):
+        return []
+    return [f for f in os.listdir(region_dir) if f.endswith(".mca")]
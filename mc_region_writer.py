@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Minecraft区域文件(.mca)写入与整理工具
+
+将区域文件中的区块按序号顺序紧密排列重新写出，去掉空闲扇区和碎片，
+可选地以指定的zlib压缩级别重新压缩区块，并更新位置表和时间戳表。
+写入总是先写临时文件，完成后再原子替换目标文件。
+"""
+
+import os
+import sys
+import time
+import stat
+import struct
+import zlib
+import tempfile
+
+from mc_region_reader import (
+    SECTOR_SIZE, HEADER_SIZE, COMPRESSION_GZIP, COMPRESSION_ZLIB,
+    parse_region_coords, read_region_header, read_chunk_payload,
+    decompress_chunk, list_region_files
+)
+from mc_world_walker import find_dimension_region_dirs, OVERWORLD
+
+# 位置表中扇区数只占一个字节
+MAX_CHUNK_SECTORS = 255
+
+
+def build_chunk_record(compression_type, compressed_data):
+    """构造单个区块在区域文件中的记录（长度 + 压缩类型 + 数据），并补齐到整扇区"""
+    record = struct.pack('>IB', len(compressed_data) + 1, compression_type) + compressed_data
+    padding = -len(record) % SECTOR_SIZE
+    return record + b'\x00' * padding
+
+
+def write_region_temp(output_path, chunks):
+    """
+    把区域文件写入output_path同目录下的临时文件，返回(临时文件路径, 文件大小)
+
+    chunks为(chunk_index, timestamp, compression_type, compressed_data)的可迭代对象，
+    区块按迭代顺序从第2个扇区开始紧密排列。任何错误都会删除临时文件并重新抛出；
+    成功后由commit_region_file替换目标文件
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, prefix=".", suffix=".mca.tmp")
+    try:
+        locations = [0] * 1024
+        timestamps = [0] * 1024
+        with os.fdopen(fd, 'wb') as out_file:
+            # 先占位头部，区块写完后再回填
+            out_file.write(b'\x00' * HEADER_SIZE)
+            sector = HEADER_SIZE // SECTOR_SIZE
+
+            for chunk_index, timestamp, compression_type, compressed_data in chunks:
+                record = build_chunk_record(compression_type, compressed_data)
+                sector_count = len(record) // SECTOR_SIZE
+                if sector_count > MAX_CHUNK_SECTORS:
+                    raise ValueError(f"区块 {chunk_index} 过大 ({sector_count} 个扇区)，无法写入区域文件")
+                out_file.write(record)
+                locations[chunk_index] = (sector << 8) | sector_count
+                timestamps[chunk_index] = timestamp
+                sector += sector_count
+
+            out_file.seek(0)
+            out_file.write(struct.pack('>1024I', *locations))
+            out_file.write(struct.pack('>1024I', *timestamps))
+            out_file.flush()
+            os.fsync(out_file.fileno())
+            file_size = sector * SECTOR_SIZE
+        return temp_path, file_size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def commit_region_file(temp_path, output_path):
+    """
+    用write_region_temp写出的临时文件原子替换output_path，失败时删除临时文件
+
+    Windows上无法替换本进程仍打开着的文件，调用前必须先关闭output_path
+    """
+    try:
+        # mkstemp创建的文件只有属主可读写，替换前恢复目标文件原有的权限
+        if os.path.exists(output_path):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(output_path).st_mode))
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_region_file(output_path, chunks):
+    """
+    原子地写出区域文件（chunks的格式同write_region_temp），返回写出的文件大小（字节）
+
+    数据先写入同目录下的临时文件，全部成功后才替换output_path
+    """
+    temp_path, file_size = write_region_temp(output_path, chunks)
+    commit_region_file(temp_path, output_path)
+    return file_size
+
+
+class MCRegionCompactor:
+    """
+    区域文件整理器
+    按区块序号重新紧密写出区域文件，回收空闲扇区
+    """
+
+    def __init__(self, mca_file_path, compression_level=None):
+        """
+        初始化整理器
+
+        compression_level为None时原样复制区块数据，否则以该zlib级别(0-9)重新压缩所有区块
+        """
+        self.mca_file_path = mca_file_path
+        self.file_name = os.path.basename(mca_file_path)
+        self.region_x, self.region_z = parse_region_coords(self.file_name)
+        self.compression_level = compression_level
+
+        # 整理结果
+        self.chunk_count = 0
+        self.recompressed_chunks = 0
+        self.original_size = 0
+        self.compacted_size = 0
+        self.error_count = 0
+
+    def _recompress(self, compression_type, compressed_data):
+        """以指定级别重新压缩区块，无法识别的压缩类型保持原样"""
+        if self.compression_level is None or compression_type not in (COMPRESSION_GZIP, COMPRESSION_ZLIB):
+            return compression_type, compressed_data
+        data = decompress_chunk(compression_type, compressed_data)
+        self.recompressed_chunks += 1
+        return COMPRESSION_ZLIB, zlib.compress(data, self.compression_level)
+
+    def iter_chunks(self, mca_file, keep_chunk=None):
+        """
+        按序号顺序逐个读出需要保留的区块
+
+        keep_chunk为可选的判断函数，接收(entry, compression_type, compressed_data)，
+        返回False的区块不会被写出
+        """
+        entries = read_region_header(mca_file, self.region_x, self.region_z)
+        for entry in sorted(entries, key=lambda e: e.chunk_index):
+            compression_type, compressed_data = read_chunk_payload(mca_file, entry)
+            if compression_type is None:
+                continue
+            if keep_chunk is not None and not keep_chunk(entry, compression_type, compressed_data):
+                continue
+            compression_type, compressed_data = self._recompress(compression_type, compressed_data)
+            self.chunk_count += 1
+            yield entry.chunk_index, entry.timestamp, compression_type, compressed_data
+
+    def compact(self, output_path=None, keep_chunk=None):
+        """
+        整理区域文件，output_path为None时原地替换
+
+        读取任何区块出错时放弃整理，原文件保持不变
+        """
+        if output_path is None:
+            output_path = self.mca_file_path
+
+        try:
+            self.original_size = os.path.getsize(self.mca_file_path)
+            with open(self.mca_file_path, 'rb') as mca_file:
+                temp_path, self.compacted_size = write_region_temp(output_path,
+                                                                   self.iter_chunks(mca_file, keep_chunk))
+            # 原文件关闭后再替换（Windows上不能替换仍打开着的文件）
+            commit_region_file(temp_path, output_path)
+            return True
+        except Exception as e:
+            self.error_count += 1
+            print(f"整理区域文件 {self.file_name} 时出错: {str(e)}")
+            return False
+
+    def get_results(self):
+        """获取整理结果"""
+        return {
+            "file_name": self.file_name,
+            "region_coords": [self.region_x, self.region_z],
+            "chunk_count": self.chunk_count,
+            "recompressed_chunks": self.recompressed_chunks,
+            "original_size": self.original_size,
+            "compacted_size": self.compacted_size,
+            "bytes_reclaimed": self.original_size - self.compacted_size,
+            "error_count": self.error_count
+        }
+
+
+def compact_region_files(save_dir, compression_level=None, max_files=None, all_dimensions=False):
+    """
+    整理存档中的所有区域文件，返回每个文件的整理结果（带有所在维度）
+
+    默认只整理主世界，all_dimensions为True时整理所有维度（下界、末地和模组维度）
+    """
+    dimensions = find_dimension_region_dirs(save_dir)
+    if not all_dimensions:
+        skipped = [name for name, _ in dimensions if name != OVERWORLD]
+        if skipped:
+            print(f"跳过其他维度: {', '.join(skipped)}（使用--all-dimensions整理所有维度）")
+        dimensions = [(name, region_dir) for name, region_dir in dimensions if name == OVERWORLD]
+
+    # (维度名称, region目录, 区域文件名)
+    mca_files = [(dimension, region_dir, mca_file)
+                 for dimension, region_dir in dimensions
+                 for mca_file in sorted(list_region_files(region_dir))]
+
+    if not mca_files:
+        print(f"在 {save_dir} 中找不到需要整理的mca文件")
+        return []
+
+    # 限制整理文件数量（如果指定）
+    if max_files and max_files > 0:
+        mca_files = mca_files[:max_files]
+
+    print(f"找到 {len(mca_files)} 个区域文件，开始整理...")
+
+    results = []
+    total_reclaimed = 0
+    for i, (dimension, region_dir, mca_file) in enumerate(mca_files):
+        print(f"整理文件 {i+1}/{len(mca_files)}: [{dimension}] {mca_file}")
+
+        start_time = time.time()
+        compactor = MCRegionCompactor(os.path.join(region_dir, mca_file), compression_level)
+        if compactor.compact():
+            result = compactor.get_results()
+            result["dimension"] = dimension
+            total_reclaimed += result["bytes_reclaimed"]
+            elapsed_time = time.time() - start_time
+            print(f"  完成，回收 {result['bytes_reclaimed']} 字节，耗时: {elapsed_time:.2f}秒")
+            results.append(result)
+        else:
+            print(f"  整理失败，原文件未改动")
+
+    print(f"\n共回收 {total_reclaimed} 字节 ({total_reclaimed / (1024 * 1024):.2f} MB)")
+    return results
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py compact 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["compact"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+报告写出工具
+
+- 默认输出紧凑JSON，需要人工阅读时可选缩进格式；安装了orjson时自动使用它编码
+- 问题区块等可能非常长的列表在发现时逐行写入JSON Lines文件，不保留在内存中，
+  生成JSON报告时再从该文件流式拷贝进去
+- 文本报告中的统计只输出数量最多的前N项，使用heapq.nlargest做部分排序
+"""
+
+import json
+import heapq
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 文本报告中每个统计段落最多输出的条目数
+REPORT_TOP_N = 100
+
+
+def dumps(obj, pretty=False):
+    """把对象编码为JSON字符串，pretty为True时使用2空格缩进"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_json(path, obj, pretty=False, stream_key=None, stream_path=None):
+    """
+    写出JSON报告
+
+    给出stream_key和stream_path时，报告中stream_key对应的列表从JSON Lines文件stream_path中
+    逐行拷贝，列表不需要完整载入内存；obj中不应包含stream_key
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        if stream_key is None:
+            f.write(dumps(obj, pretty))
+            f.write("\n")
+            return
+
+        # 去掉对象末尾的右花括号，在后面接上流式写出的列表
+        head = dumps(obj, pretty).rstrip()[:-1].rstrip()
+        f.write(head)
+        if obj:
+            f.write(",")
+        indent = "\n  " if pretty else ""
+        item_indent = "\n    " if pretty else ""
+        f.write(f"{indent}{dumps(stream_key)}:{' ' if pretty else ''}[")
+
+        count = 0
+        with open(stream_path, 'r', encoding='utf-8') as stream:
+            for line in stream:
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                f.write(("," if count else "") + item_indent + line)
+                count += 1
+
+        if count and pretty:
+            f.write("\n  ")
+        f.write("]\n}\n" if pretty else "]}\n")
+
+
+def top_items(stats, n=REPORT_TOP_N):
+    """返回数量最多的前n项[(键, 数量)]，n为None时返回全部（按数量排序）"""
+    if n is None or n >= len(stats):
+        return sorted(stats.items(), key=itemgetter(1), reverse=True)
+    return heapq.nlargest(n, stats.items(), key=itemgetter(1))
+
+
+def write_top_stats(f, stats, n=REPORT_TOP_N, annotate=None):
+    """
+    向文本报告写出统计中数量最多的前n项
+
+    annotate(键)返回附加在行尾的说明（如" (可能有问题)"）
+    """
+    for key, count in top_items(stats, n):
+        suffix = annotate(key) if annotate is not None else ""
+        f.write(f"  {key}: {count}{suffix}\n")
+    if n is not None and len(stats) > n:
+        f.write(f"  ... 还有 {len(stats) - n} 项 (查看JSON文件获取完整统计)\n")
+
+
+class JsonLinesWriter:
+    """
+    JSON Lines写出器
+    记录在发现时逐行写入磁盘，只在内存中保留前preview_size条用于文本报告
+    """
+
+    def __init__(self, path, preview_size=REPORT_TOP_N):
+        self.path = path
+        self.preview_size = preview_size
+        self.preview = []
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        """写出一条记录"""
+        self._file.write(dumps(record))
+        self._file.write("\n")
+        self.count += 1
+        if len(self.preview) < self.preview_size:
+            self.preview.append(record)
+
+    def flush(self):
+        """把已写出的记录写入磁盘，使其他读取者可以看到"""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """关闭文件，可以重复调用"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iter_json_lines(path):
+    """逐条读取JSON Lines文件中的记录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -2,32 +2,45 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
-import struct
+import sys
 import gzip
 import zlib
 import time
 import amulet_nbt as nbt
 from io import BytesIO
+from functools import partial
 from collections import defaultdict
 
+from mc_region_reader import SECTOR_SIZE, parse_region_coords, read_region_header, read_chunk_payload
+from mc_inventory_scanner import has_inventory, scan_inventory, load_item_registry
+from mc_world_walker import WorldWalker, OVERWORLD
+from mc_progress import current_counter, report_error, flush_messages
+from mc_report_writer import dumps, write_json, write_top_stats
+
 class MCRegionAnalyzer:
     """
     使用amulet-nbt库分析Minecraft区域文件（.mca）的工具类
     支持旧版本的Minecraft存档（1.7.10及以上）
     """
     
-    def __init__(self, mca_file_path):
-        """初始化分析器"""
+    def __init__(self, mca_file_path, deep_scan=False, chunk_stream_path=None, chunk_filter=None,
+                 item_names=None):
+        """
+        初始化分析器
+        
+        deep_scan为True时额外统计方块实体物品栏中的物品ID（包括嵌套的物品）；
+        chunk_stream_path不为None时，区块信息在分析过程中逐行写入该JSON Lines文件，不保留在内存中；
+        chunk_filter为ChunkFilter时只读取和分析其中包含的区块；
+        item_names为{数字ID: 注册名}（见load_item_registry），深度扫描时数字物品ID按其换算为注册名
+        """
         self.mca_file_path = mca_file_path
+        self.deep_scan = deep_scan
+        self.chunk_stream_path = chunk_stream_path
+        self._chunk_stream = None
+        self.chunk_filter = chunk_filter
+        self.item_names = item_names
         self.file_name = os.path.basename(mca_file_path)
-        try:
-            parts = self.file_name.replace('r.', '').replace('.mca', '').split('.')
-            self.region_x = int(parts[0])
-            self.region_z = int(parts[1])
-        except:
-            self.region_x = 0
-            self.region_z = 0
+        self.region_x, self.region_z = parse_region_coords(self.file_name)
         
         # 分析结果
         self.analyzed_chunks = 0
@@ -36,57 +49,51 @@ class MCRegionAnalyzer:
         self.block_stats = defaultdict(int)
         self.entity_stats = defaultdict(int)
         self.tile_entity_stats = defaultdict(int)
+        self.item_stats = defaultdict(int)
     
     def read_mca_file(self):
         """读取MCA文件并分析其内容"""
         try:
+            if self.chunk_stream_path is not None:
+                self._chunk_stream = open(self.chunk_stream_path, 'w', encoding='utf-8')
+            
             with open(self.mca_file_path, 'rb') as mca_file:
-                # 读取头部
-                header_data = mca_file.read(8192)  # 4096字节的位置信息 + 4096字节的时间戳信息
+                # 读取头部，分析区块位置和大小
+                chunks_to_analyze = read_region_header(mca_file, self.region_x, self.region_z)
                 
-                # 分析区块位置和大小
-                chunks_to_analyze = []
-                for chunk_index in range(1024):  # 32x32区块
-                    loc_offset = chunk_index * 4
-                    sectors_data = header_data[loc_offset:loc_offset+3]
-                    sectors_count = header_data[loc_offset+3]
-                    
-                    if sectors_count > 0:  # 区块存在
-                        offset = struct.unpack('>I', b'\x00' + sectors_data)[0] * 4096  # 转换为字节偏移
-                        size_in_sectors = sectors_count
-                        
-                        # 计算区块坐标
-                        chunk_x = (self.region_x * 32) + (chunk_index % 32)
-                        chunk_z = (self.region_z * 32) + (chunk_index // 32)
-                        
-                        chunks_to_analyze.append((chunk_index, chunk_x, chunk_z, offset, size_in_sectors))
+                # 只读取过滤范围内的区块数据
+                if self.chunk_filter is not None:
+                    chunks_to_analyze = self.chunk_filter.filter_entries(chunks_to_analyze)
                 
                 # 遍历并分析发现的区块
-                for i, (chunk_index, chunk_x, chunk_z, offset, size_in_sectors) in enumerate(chunks_to_analyze):
+                progress = current_counter()
+                bytes_counted = 0
+                for entry in chunks_to_analyze:
                     try:
-                        # 跳转到区块位置
-                        mca_file.seek(offset)
+                        compression_type, compressed_data = read_chunk_payload(mca_file, entry)
                         
-                        # 读取区块数据长度
-                        length = struct.unpack('>I', mca_file.read(4))[0]
-                        
-                        if length > 0:
-                            # 读取压缩类型
-                            compression_type = struct.unpack('B', mca_file.read(1))[0]
-                            
-                            # 读取压缩数据
-                            compressed_data = mca_file.read(length - 1)
-                            
+                        if compression_type is not None:
                             # 分析这个区块
-                            self.analyze_chunk(chunk_x, chunk_z, compression_type, compressed_data)
+                            self.analyze_chunk(entry.chunk_x, entry.chunk_z, compression_type, compressed_data)
                     except Exception as e:
                         self.error_count += 1
-                        print(f"处理区块 ({chunk_x}, {chunk_z}) 时出错: {str(e)}")
+                        report_error("处理区块时出错", f"处理区块 ({entry.chunk_x}, {entry.chunk_z}) 时出错: {str(e)}")
+                    chunk_bytes = entry.sector_count * SECTOR_SIZE
+                    bytes_counted += chunk_bytes
+                    progress.add(bytes_read=chunk_bytes, chunks=1)
+                
+                # 头部、空闲扇区和被过滤的区块也计入已处理字节数
+                progress.add(bytes_read=max(os.fstat(mca_file.fileno()).st_size - bytes_counted, 0))
             
             return True
         except Exception as e:
-            print(f"读取MCA文件时出错: {str(e)}")
+            report_error("读取MCA文件时出错", f"读取MCA文件 {self.file_name} 时出错: {str(e)}")
             return False
+        finally:
+            if self._chunk_stream is not None:
+                self._chunk_stream.close()
+                self._chunk_stream = None
+            flush_messages()
     
     def analyze_chunk(self, chunk_x, chunk_z, compression_type, compressed_data):
         """分析单个区块的数据"""
@@ -97,7 +104,7 @@ class MCRegionAnalyzer:
             elif compression_type == 2:  # Zlib压缩
                 data = zlib.decompress(compressed_data)
             else:
-                print(f"未知的压缩类型 {compression_type} (区块: {chunk_x}, {chunk_z})")
+                report_error("未知的压缩类型", f"未知的压缩类型 {compression_type} (区块: {chunk_x}, {chunk_z})")
                 return
             
             # 解析NBT数据
@@ -117,7 +124,6 @@ class MCRegionAnalyzer:
                     for entity in entities:
                         if "id" in entity:
                             entity_id = str(entity["id"])
-                            self.entity_stats[entity_id] += 1
                             
                             entity_info = {
                                 "id": entity_id
@@ -135,7 +141,7 @@ class MCRegionAnalyzer:
                             
                             chunk_info["entities"].append(entity_info)
             except Exception as e:
-                print(f"处理实体数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
+                report_error("处理实体数据时出错", f"处理实体数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
             
             # 处理方块实体
             try:
@@ -144,7 +150,6 @@ class MCRegionAnalyzer:
                     for tile_entity in tile_entities:
                         if "id" in tile_entity:
                             tile_id = str(tile_entity["id"])
-                            self.tile_entity_stats[tile_id] += 1
                             
                             tile_info = {
                                 "id": tile_id
@@ -159,8 +164,14 @@ class MCRegionAnalyzer:
                                 ]
                             
                             chunk_info["tile_entities"].append(tile_info)
+                            
+                            # 深度扫描物品栏
+                            if self.deep_scan and has_inventory(tile_entity):
+                                if "item_stats" not in chunk_info:
+                                    chunk_info["item_stats"] = defaultdict(int)
+                                scan_inventory(tile_entity, chunk_info["item_stats"], self.item_names)
             except Exception as e:
-                print(f"处理方块实体数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
+                report_error("处理方块实体数据时出错", f"处理方块实体数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
             
             # 统计区块中的方块数据（基本信息）
             try:
@@ -173,30 +184,52 @@ class MCRegionAnalyzer:
                             # 这对于1.7.10来说比较复杂
                             chunk_info["has_blocks"] = True
             except Exception as e:
-                print(f"处理方块数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
+                report_error("处理方块数据时出错", f"处理方块数据时出错 (区块: {chunk_x}, {chunk_z}): {str(e)}")
+            
+            if "item_stats" in chunk_info:
+                chunk_info["item_stats"] = dict(chunk_info["item_stats"])
+                chunk_info["has_inventory_items"] = bool(chunk_info["item_stats"])
             
             # 保存区块信息
-            self.chunks_data.append(chunk_info)
-            self.analyzed_chunks += 1
+            self._add_chunk_info(chunk_info)
             
         except Exception as e:
             self.error_count += 1
-            print(f"分析区块 ({chunk_x}, {chunk_z}) 时出错: {str(e)}")
+            report_error("分析区块时出错", f"分析区块 ({chunk_x}, {chunk_z}) 时出错: {str(e)}")
+    
+    def _add_chunk_info(self, chunk_info):
+        """记录区块信息并更新实体统计"""
+        for entity_info in chunk_info["entities"]:
+            self.entity_stats[entity_info["id"]] += 1
+        for tile_info in chunk_info["tile_entities"]:
+            self.tile_entity_stats[tile_info["id"]] += 1
+        for item_id, count in chunk_info.get("item_stats", {}).items():
+            self.item_stats[item_id] += count
+        
+        if self._chunk_stream is not None:
+            self._chunk_stream.write(dumps(chunk_info) + "\n")
+        else:
+            self.chunks_data.append(chunk_info)
+        self.analyzed_chunks += 1
     
     def get_results(self):
-        """获取分析结果"""
-        return {
+        """获取分析结果，流式输出时区块详情位于chunks_file指向的文件中"""
+        results = {
             "file_name": self.file_name,
             "region_coords": [self.region_x, self.region_z],
             "analyzed_chunks": self.analyzed_chunks,
             "error_count": self.error_count,
             "entity_stats": dict(self.entity_stats),
             "tile_entity_stats": dict(self.tile_entity_stats),
+            "item_stats": dict(self.item_stats),
             "chunks": self.chunks_data
         }
+        if self.chunk_stream_path is not None:
+            results["chunks_file"] = self.chunk_stream_path
+        return results
     
-    def save_analysis(self, output_txt=None, output_json=None):
-        """保存分析结果到文件"""
+    def save_analysis(self, output_txt=None, output_json=None, pretty=False):
+        """保存分析结果到文件，pretty为True时JSON使用缩进格式"""
         if output_txt is None:
             output_txt = f"{self.file_name}_analysis.txt"
         
@@ -217,17 +250,22 @@ class MCRegionAnalyzer:
             
             if self.entity_stats:
                 f.write("实体统计:\n")
-                for entity_id, count in sorted(self.entity_stats.items(), key=lambda x: x[1], reverse=True):
-                    f.write(f"  {entity_id}: {count}\n")
+                write_top_stats(f, self.entity_stats)
                 f.write("\n")
             
             if self.tile_entity_stats:
                 f.write("方块实体统计:\n")
-                for tile_id, count in sorted(self.tile_entity_stats.items(), key=lambda x: x[1], reverse=True):
-                    f.write(f"  {tile_id}: {count}\n")
+                write_top_stats(f, self.tile_entity_stats)
+                f.write("\n")
+            
+            if self.item_stats:
+                f.write("物品栏物品统计:\n")
+                write_top_stats(f, self.item_stats)
                 f.write("\n")
             
-            if self.chunks_data:
+            if self.chunk_stream_path is not None:
+                f.write(f"区块详情已逐行写入 {self.chunk_stream_path}\n")
+            elif self.chunks_data:
                 f.write(f"区块详情 (显示前10个):\n")
                 for i, chunk in enumerate(self.chunks_data[:10]):
                     f.write(f"区块 {i+1}: 坐标 {chunk['coords']}\n")
@@ -238,15 +276,72 @@ class MCRegionAnalyzer:
                     f.write("\n")
         
         # 保存JSON报告
-        with open(output_json, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        write_json(output_json, results, pretty)
         
         print(f"分析完成，结果保存至 {output_txt} 和 {output_json}")
         return output_txt, output_json
 
 
-def analyze_multiple_mca_files(save_dir, output_dir=None, max_files=3):
-    """分析多个MCA文件并生成报告"""
+def analyze_region_task(task, deep_scan=False, chunk_filter=None, registry_dir=None):
+    """
+    分析单个区域文件并返回分析结果（供WorldWalker调度），读取失败时返回None
+    
+    深度扫描且给出registry_dir时，按该存档level.dat中的物品ID表换算数字物品ID（每个进程只读取一次）
+    """
+    item_names = load_item_registry(registry_dir) if deep_scan and registry_dir else None
+    chunk_filter = chunk_filter.for_dimension(task.dimension) if chunk_filter is not None else None
+    analyzer = MCRegionAnalyzer(task.path, deep_scan, chunk_filter=chunk_filter, item_names=item_names)
+    if not analyzer.read_mca_file():
+        return None
+    return analyzer.get_results()
+
+
+def save_region_analysis_task(task, output_dir, deep_scan=False, stream=False, split_dimensions=False,
+                              chunk_filter=None, pretty=False, registry_dir=None):
+    """
+    分析单个区域文件并把报告保存到输出目录（供WorldWalker调度），返回摘要，读取失败时返回None
+    
+    stream为True时区块详情逐行写入<文件名>_chunks.jsonl；
+    split_dimensions为True时结果保存到output_dir下以维度命名的子目录；
+    registry_dir同analyze_region_task
+    """
+    if split_dimensions:
+        output_dir = os.path.join(output_dir, task.dimension)
+        os.makedirs(output_dir, exist_ok=True)
+    chunk_stream_path = os.path.join(output_dir, f"{task.file_name}_chunks.jsonl") if stream else None
+    
+    start_time = time.time()
+    item_names = load_item_registry(registry_dir) if deep_scan and registry_dir else None
+    chunk_filter = chunk_filter.for_dimension(task.dimension) if chunk_filter is not None else None
+    analyzer = MCRegionAnalyzer(task.path, deep_scan, chunk_stream_path, chunk_filter, item_names)
+    if not analyzer.read_mca_file():
+        return None
+    
+    # 保存结果到输出目录
+    txt_file = os.path.join(output_dir, f"{task.file_name}_analysis.txt")
+    json_file = os.path.join(output_dir, f"{task.file_name}_analysis.json")
+    analyzer.save_analysis(txt_file, json_file, pretty)
+    
+    return {
+        "analyzed_chunks": analyzer.analyzed_chunks,
+        "error_count": analyzer.error_count,
+        "elapsed_time": time.time() - start_time
+    }
+
+
+def analyze_multiple_mca_files(save_dir, output_dir=None, max_files=None, deep_scan=False,
+                               all_dimensions=False, workers=1, stream=False,
+                               chunk_filter=None, show_progress=True, pretty=False):
+    """
+    分析多个MCA文件并生成报告
+    
+    max_files为None时分析全部文件，否则只分析最大的max_files个文件；
+    deep_scan为True时同时统计方块实体物品栏中的物品（数字物品ID按level.dat中的FML物品ID表换算为注册名）；
+    all_dimensions为True时同时分析所有维度，结果按维度保存到output_dir下的子目录；
+    workers大于1时使用多进程并行分析；stream为True时区块详情边分析边写入磁盘；
+    chunk_filter为ChunkFilter时只打开可能包含所需区块的区域文件，并且只读取和解码所需的区块；
+    pretty为True时JSON报告使用缩进格式（默认输出紧凑JSON）
+    """
     if output_dir is None:
         output_dir = "analysis_results"
     
@@ -255,53 +350,39 @@ def analyze_multiple_mca_files(save_dir, output_dir=None, max_files=3):
     
     # 获取region目录
     region_dir = os.path.join(save_dir, "region")
-    if not os.path.exists(region_dir):
+    if not all_dimensions and not os.path.exists(region_dir):
         print(f"找不到region目录: {region_dir}")
-        return
+        return False
     
-    # 获取所有mca文件
-    mca_files = [f for f in os.listdir(region_dir) if f.endswith(".mca")]
+    # 获取所有mca文件，大文件优先
+    walker = WorldWalker(save_dir, None if all_dimensions else [OVERWORLD],
+                         chunk_filter=chunk_filter, show_progress=show_progress)
+    tasks = walker.build_work_queue(max_files)
     
-    if not mca_files:
-        print(f"在 {region_dir} 中找不到mca文件")
-        return
+    if not tasks:
+        print(f"在 {save_dir} 中找不到mca文件")
+        return False
     
-    print(f"找到 {len(mca_files)} 个mca文件，将分析前 {min(max_files, len(mca_files))} 个")
+    print(f"将分析 {len(tasks)} 个mca文件")
     
-    # 分析选定的文件
-    for i, mca_file in enumerate(mca_files[:max_files]):
-        mca_path = os.path.join(region_dir, mca_file)
-        print(f"分析文件 {i+1}/{min(max_files, len(mca_files))}: {mca_file}")
-        
-        start_time = time.time()
-        analyzer = MCRegionAnalyzer(mca_path)
-        success = analyzer.read_mca_file()
-        
-        if success:
-            # 保存结果到输出目录
-            txt_file = os.path.join(output_dir, f"{mca_file}_analysis.txt")
-            json_file = os.path.join(output_dir, f"{mca_file}_analysis.json")
-            analyzer.save_analysis(txt_file, json_file)
-            
-            elapsed_time = time.time() - start_time
-            print(f"  完成，耗时: {elapsed_time:.2f}秒")
+    def on_result(task, summary):
+        if summary is None:
+            print(f"  分析失败: [{task.dimension}] {task.file_name}")
         else:
-            print(f"  分析失败")
+            print(f"  完成，耗时: {summary['elapsed_time']:.2f}秒")
+    
+    task_func = partial(save_region_analysis_task, output_dir=output_dir, deep_scan=deep_scan,
+                        stream=stream, split_dimensions=all_dimensions, chunk_filter=chunk_filter,
+                        pretty=pretty, registry_dir=save_dir)
+    walker.run(task_func, workers, tasks=tasks, on_result=on_result)
+    return True
 
 
-def main():
-    """主函数"""
-    # 定义存档目录
-    save_dir = "save_world"
-    
-    # 创建输出目录
-    output_dir = "analysis_results"
-    
-    # 分析多个文件
-    analyze_multiple_mca_files(save_dir, output_dir, max_files=3)
-    
-    print("\n所有分析任务完成！")
+def main(argv=None):
+    """主函数，参数与 mc_cli.py analyze 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["analyze"] + (sys.argv[1:] if argv is None else list(argv)))
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
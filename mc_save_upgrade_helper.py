@@ -2,13 +2,57 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
+import sys
 import time
 import shutil
+from functools import partial
 from collections import defaultdict
 
 # 导入mc_save_analyzer模块
-from mc_save_analyzer import MCRegionAnalyzer, analyze_multiple_mca_files
+from mc_save_analyzer import MCRegionAnalyzer, analyze_multiple_mca_files, analyze_region_task
+from mc_world_walker import WorldWalker, OVERWORLD, dimension_sort_key
+from mc_checkpoint import CheckpointJournal, region_state
+from mc_inventory_scanner import load_item_registry, registry_digest
+from mc_report_writer import JsonLinesWriter, iter_json_lines, write_json, write_top_stats, REPORT_TOP_N
+
+# 检查点日志文件名（位于输出目录中）
+CHECKPOINT_FILE = "upgrade_analysis_checkpoint.jsonl"
+
+# 问题区块列表文件名（位于输出目录中），问题区块在发现时逐行写入
+ISSUES_FILE = "upgrade_analysis_issues.jsonl"
+
+# 可能在1.7.10升级到新版本时有问题的实体
+DEFAULT_PROBLEMATIC_ENTITIES = [
+    "Minecart",  # 矿车可能会有变化
+    "Boat",      # 船的机制有变化
+    "ItemFrame", # 物品展示框的一些属性变化
+    "Vehicle",   # 模组添加的交通工具
+    "IC2.",      # IC2模组实体
+    "BambooMod" # 模组实体
+]
+
+# 可能在1.7.10升级到新版本时有问题的方块实体
+DEFAULT_PROBLEMATIC_TILE_ENTITIES = [
+    "RCHiddenTile",  # 铁路工艺模组的方块
+    "CF-Wall",       # 模组方块
+    "BambooMultiBlock", # 模组复杂方块
+    "IC2NC",         # IC2模组方块
+    "Tile",          # 许多模组方块前缀
+    "TileArcaneLamp" # 神秘时代模组方块
+]
+
+# 可能在1.7.10升级到新版本时有问题的物品
+DEFAULT_PROBLEMATIC_ITEMS = [
+    "IC2:itemCable",       # IC2模组线缆
+    "appliedenergistics2:item.ItemBasicStorageCell.1k",  # AE2存储元件
+    "Thaumcraft:WandCasting"  # 神秘时代法杖
+]
+
+
+def is_problematic_id(type_id, problematic_types):
+    """判断实体、方块实体或物品ID是否属于可能在升级中有问题的类型"""
+    return type_id in problematic_types
+
 
 class MinecraftSaveUpgradeHelper:
     """
@@ -16,10 +60,11 @@ class MinecraftSaveUpgradeHelper:
     帮助识别并分析可能在版本升级中存在问题的区块或实体
     """
     
-    def __init__(self, save_dir, output_dir="upgrade_analysis"):
-        """初始化升级助手"""
+    def __init__(self, save_dir, output_dir="upgrade_analysis", pretty_json=False):
+        """初始化升级助手，pretty_json为True时JSON报告使用缩进格式"""
         self.save_dir = save_dir
         self.output_dir = output_dir
+        self.pretty_json = pretty_json
         self.region_dir = os.path.join(save_dir, "region")
         
         # 确保输出目录存在
@@ -28,9 +73,22 @@ class MinecraftSaveUpgradeHelper:
         # 分析结果
         self.problematic_entity_types = []
         self.problematic_tile_entity_types = []
+        self.problematic_item_types = []
         self.entity_stats = defaultdict(int)
         self.tile_entity_stats = defaultdict(int)
-        self.chunks_with_issues = []
+        self.item_stats = defaultdict(int)
+        self.issues_file = os.path.join(output_dir, ISSUES_FILE)
+        self._issue_writer = None
+        self._journal = None
+        
+        # 按维度分组的统计
+        self.dimension_stats = defaultdict(lambda: {
+            "region_files": 0,
+            "analyzed_chunks": 0,
+            "chunks_with_issues": 0,
+            "entity_stats": defaultdict(int),
+            "tile_entity_stats": defaultdict(int)
+        })
     
     def set_problematic_entities(self, entity_list):
         """设置可能在升级中有问题的实体类型"""
@@ -40,72 +98,191 @@ class MinecraftSaveUpgradeHelper:
         """设置可能在升级中有问题的方块实体类型"""
         self.problematic_tile_entity_types = tile_entity_list
     
-    def analyze_save(self, max_files=None):
-        """分析整个存档，查找可能有问题的区域"""
-        if not os.path.exists(self.region_dir):
+    def set_problematic_items(self, item_list):
+        """设置可能在升级中有问题的物品ID（用于物品栏深度扫描）"""
+        self.problematic_item_types = item_list
+    
+    def analyze_save(self, max_files=None, all_dimensions=False, workers=1, deep_scan=False,
+                     chunk_filter=None, show_progress=True, resume=False):
+        """
+        分析整个存档，查找可能有问题的区域
+        
+        all_dimensions为True时同时分析DIM-1、DIM1及模组添加的所有维度；
+        workers大于1时使用多进程并行分析，大文件优先调度；
+        deep_scan为True时扫描箱子、机器等方块实体的物品栏，标记存放问题物品的区块
+        （1.7.10的数字物品ID按level.dat中FML.ItemData的ID表换算为注册名后再匹配）；
+        chunk_filter为ChunkFilter时只打开可能包含所需区块的区域文件，并且只读取和解码所需的区块；
+        每完成一个区域文件都会记录到输出目录中的检查点日志，resume为True时跳过日志中
+        已完成且未被修改过的区域文件，并把日志中的结果合并到本次的报告中
+        """
+        if not all_dimensions and not os.path.exists(self.region_dir):
             print(f"找不到region目录: {self.region_dir}")
             return False
         
-        # 获取所有mca文件
-        mca_files = [f for f in os.listdir(self.region_dir) if f.endswith(".mca")]
+        # 获取所有mca文件，限制分析文件数量（如果指定）
+        walker = WorldWalker(self.save_dir, None if all_dimensions else [OVERWORLD],
+                             chunk_filter=chunk_filter, show_progress=show_progress)
+        tasks = walker.build_work_queue(max_files)
         
-        if not mca_files:
-            print(f"在 {self.region_dir} 中找不到mca文件")
+        if not tasks:
+            print(f"在 {self.save_dir} 中找不到mca文件")
             return False
         
-        # 限制分析文件数量（如果指定）
-        if max_files and max_files > 0:
-            mca_files = mca_files[:max_files]
+        dimension_names = sorted({task.dimension for task in tasks}, key=dimension_sort_key)
+        print(f"找到 {len(tasks)} 个区域文件 (维度: {', '.join(dimension_names)})，开始分析...")
         
-        total_files = len(mca_files)
-        print(f"找到 {total_files} 个区域文件，开始分析...")
+        # 检查点日志，扫描参数不同的旧日志不会被使用
+        journal = CheckpointJournal(os.path.join(self.output_dir, CHECKPOINT_FILE), {
+            "save_dir": os.path.abspath(self.save_dir),
+            "all_dimensions": all_dimensions,
+            "deep_scan": deep_scan,
+            "item_registry": registry_digest(load_item_registry(self.save_dir)) if deep_scan else None,
+            "chunk_filter": chunk_filter.to_dict() if chunk_filter is not None else None,
+            "problematic_entity_types": self.problematic_entity_types,
+            "problematic_tile_entity_types": self.problematic_tile_entity_types,
+            "problematic_item_types": self.problematic_item_types
+        })
+        completed = journal.load() if resume else {}
+        self._issue_writer = JsonLinesWriter(self.issues_file)
+        
+        # 已完成且文件未被修改过的区域直接合并日志中的结果
+        valid_records = {}
+        pending_tasks = []
+        for task in tasks:
+            key = (task.dimension, task.file_name)
+            record = completed.get(key)
+            if record is not None and [record["size"], record["mtime_ns"]] == list(region_state(task.path)):
+                valid_records[key] = record
+                self._apply_region_record(record)
+            else:
+                pending_tasks.append(task)
+        
+        if resume:
+            print(f"从检查点恢复了 {len(valid_records)} 个区域文件的结果，剩余 {len(pending_tasks)} 个需要分析")
         
         # 统计各种实体和方块实体
-        for i, mca_file in enumerate(mca_files):
-            mca_path = os.path.join(self.region_dir, mca_file)
-            print(f"分析文件 {i+1}/{total_files}: {mca_file}")
-            
-            # 使用MCRegionAnalyzer分析区域文件
-            analyzer = MCRegionAnalyzer(mca_path)
-            success = analyzer.read_mca_file()
-            
-            if success:
-                # 更新统计信息
-                for entity_type, count in analyzer.entity_stats.items():
-                    self.entity_stats[entity_type] += count
-                
-                for tile_type, count in analyzer.tile_entity_stats.items():
-                    self.tile_entity_stats[tile_type] += count
-                
-                # 标记有问题的区块
-                for chunk in analyzer.chunks_data:
-                    chunk_has_issue = False
-                    issues = []
-                    
-                    # 检查是否包含有问题的实体
-                    for entity in chunk.get("entities", []):
-                        if entity.get("id") in self.problematic_entity_types:
-                            chunk_has_issue = True
-                            issues.append(f"问题实体: {entity.get('id')}")
-                    
-                    # 检查是否包含有问题的方块实体
-                    for tile_entity in chunk.get("tile_entities", []):
-                        if tile_entity.get("id") in self.problematic_tile_entity_types:
-                            chunk_has_issue = True
-                            issues.append(f"问题方块实体: {tile_entity.get('id')}")
-                    
-                    if chunk_has_issue:
-                        self.chunks_with_issues.append({
-                            "file": mca_file,
-                            "coords": chunk.get("coords"),
-                            "issues": issues
-                        })
-        
-        # 生成报告
+        task_func = partial(analyze_region_task, deep_scan=deep_scan, chunk_filter=chunk_filter,
+                            registry_dir=self.save_dir)
+        journal.start(valid_records)
+        self._journal = journal
+        try:
+            walker.run(task_func, workers, tasks=pending_tasks, on_result=self._merge_region_result)
+        finally:
+            self._journal = None
+            journal.close()
+        
+        # 生成报告，报告写出后检查点不再需要
         self.generate_report()
+        journal.remove()
         
         return True
     
+    def _merge_region_result(self, task, results):
+        """合并单个区域文件的分析结果，并记录到检查点日志"""
+        if results is None:
+            print(f"  分析失败: [{task.dimension}] {task.file_name}")
+            return
+        
+        record = self._build_region_record(task, results)
+        self._apply_region_record(record)
+        if self._journal is not None:
+            self._journal.append(record)
+    
+    def _build_region_record(self, task, results):
+        """
+        从区域文件的分析结果中提取需要汇总的部分（统计数据和问题区块）
+        
+        记录可以JSON序列化，既用于合并到汇总，也写入检查点日志
+        """
+        chunks_with_issues = []
+        
+        # 标记有问题的区块
+        for chunk in results["chunks"]:
+            chunk_has_issue = False
+            issues = []
+            
+            # 检查是否包含有问题的实体
+            for entity in chunk.get("entities", []):
+                if is_problematic_id(entity.get("id"), self.problematic_entity_types):
+                    chunk_has_issue = True
+                    issues.append(f"问题实体: {entity.get('id')}")
+            
+            # 检查是否包含有问题的方块实体
+            for tile_entity in chunk.get("tile_entities", []):
+                if is_problematic_id(tile_entity.get("id"), self.problematic_tile_entity_types):
+                    chunk_has_issue = True
+                    issues.append(f"问题方块实体: {tile_entity.get('id')}")
+            
+            # 检查物品栏中是否存放有问题的物品（仅深度扫描）
+            for item_id, count in chunk.get("item_stats", {}).items():
+                if is_problematic_id(item_id, self.problematic_item_types):
+                    chunk_has_issue = True
+                    issues.append(f"问题物品: {item_id} x{count}")
+            
+            if chunk_has_issue:
+                chunks_with_issues.append({
+                    "dimension": task.dimension,
+                    "file": task.file_name,
+                    "coords": chunk.get("coords"),
+                    "issues": issues
+                })
+        
+        size, mtime_ns = region_state(task.path)
+        return {
+            "dimension": task.dimension,
+            "file": task.file_name,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "analyzed_chunks": results["analyzed_chunks"],
+            "entity_stats": results["entity_stats"],
+            "tile_entity_stats": results["tile_entity_stats"],
+            "item_stats": results["item_stats"],
+            "chunks_with_issues": chunks_with_issues
+        }
+    
+    def _apply_region_record(self, record):
+        """把单个区域文件的记录合并到汇总结果"""
+        dimension_stats = self.dimension_stats[record["dimension"]]
+        dimension_stats["region_files"] += 1
+        dimension_stats["analyzed_chunks"] += record["analyzed_chunks"]
+        
+        # 更新统计信息
+        for entity_type, count in record["entity_stats"].items():
+            self.entity_stats[entity_type] += count
+            dimension_stats["entity_stats"][entity_type] += count
+        
+        for tile_type, count in record["tile_entity_stats"].items():
+            self.tile_entity_stats[tile_type] += count
+            dimension_stats["tile_entity_stats"][tile_type] += count
+        
+        for item_id, count in record["item_stats"].items():
+            self.item_stats[item_id] += count
+        
+        dimension_stats["chunks_with_issues"] += len(record["chunks_with_issues"])
+        for chunk in record["chunks_with_issues"]:
+            self._issue_writer.write(chunk)
+    
+    @property
+    def issue_count(self):
+        """已发现的问题区块数"""
+        return self._issue_writer.count if self._issue_writer is not None else 0
+    
+    def iter_issues(self):
+        """
+        逐条读取已发现的问题区块（从issues_file流式读取，不在内存中保留整个列表）
+        
+        结果可以直接传给MCChunkPruner.add_chunks_with_issues；尚未分析时不返回任何记录
+        """
+        if self._issue_writer is None:
+            return iter(())
+        self._issue_writer.flush()
+        return iter_json_lines(self.issues_file)
+    
+    @property
+    def chunks_with_issues(self):
+        """问题区块列表（兼容旧接口，会把所有记录载入内存，大存档请使用iter_issues）"""
+        return list(self.iter_issues())
+    
     def generate_report(self):
         """生成升级分析报告"""
         report_file = os.path.join(self.output_dir, "upgrade_analysis_report.txt")
@@ -117,14 +294,25 @@ class MinecraftSaveUpgradeHelper:
             "analysis_time": time.strftime("%Y-%m-%d %H:%M:%S"),
             "entity_stats": dict(self.entity_stats),
             "tile_entity_stats": dict(self.tile_entity_stats),
+            "item_stats": dict(self.item_stats),
             "problematic_entity_types": self.problematic_entity_types,
             "problematic_tile_entity_types": self.problematic_tile_entity_types,
-            "chunks_with_issues": self.chunks_with_issues
+            "problematic_item_types": self.problematic_item_types,
+            "dimension_stats": {
+                dimension: dict(stats, entity_stats=dict(stats["entity_stats"]),
+                                tile_entity_stats=dict(stats["tile_entity_stats"]))
+                for dimension, stats in self.dimension_stats.items()
+            },
+            "chunks_with_issue_count": self.issue_count
         }
         
-        # 保存JSON报告
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, ensure_ascii=False, indent=2)
+        # 保存JSON报告，问题区块列表从逐行写出的文件中流式拷贝
+        if self._issue_writer is not None:
+            self._issue_writer.close()
+            write_json(json_file, report_data, self.pretty_json,
+                       stream_key="chunks_with_issues", stream_path=self.issues_file)
+        else:
+            write_json(json_file, dict(report_data, chunks_with_issues=[]), self.pretty_json)
         
         # 保存文本报告
         with open(report_file, 'w', encoding='utf-8') as f:
@@ -133,30 +321,45 @@ class MinecraftSaveUpgradeHelper:
             f.write(f"存档目录: {self.save_dir}\n")
             f.write(f"分析时间: {report_data['analysis_time']}\n\n")
             
+            # 写入维度统计
+            if len(self.dimension_stats) > 1:
+                f.write("维度统计:\n")
+                for dimension, stats in sorted(self.dimension_stats.items(),
+                                               key=lambda x: dimension_sort_key(x[0])):
+                    f.write(f"  {dimension}: {stats['region_files']} 个区域文件, "
+                            f"{stats['analyzed_chunks']} 个区块, "
+                            f"{stats['chunks_with_issues']} 个问题区块\n")
+                f.write("\n")
+            
             # 写入实体统计
             f.write("实体统计:\n")
-            for entity_type, count in sorted(self.entity_stats.items(), key=lambda x: x[1], reverse=True):
-                problematic = " (可能有问题)" if entity_type in self.problematic_entity_types else ""
-                f.write(f"  {entity_type}: {count}{problematic}\n")
+            write_top_stats(f, self.entity_stats, annotate=lambda entity_type: (
+                " (可能有问题)" if is_problematic_id(entity_type, self.problematic_entity_types) else ""))
             f.write("\n")
             
             # 写入方块实体统计
             f.write("方块实体统计:\n")
-            for tile_type, count in sorted(self.tile_entity_stats.items(), key=lambda x: x[1], reverse=True):
-                problematic = " (可能有问题)" if tile_type in self.problematic_tile_entity_types else ""
-                f.write(f"  {tile_type}: {count}{problematic}\n")
+            write_top_stats(f, self.tile_entity_stats, annotate=lambda tile_type: (
+                " (可能有问题)" if is_problematic_id(tile_type, self.problematic_tile_entity_types) else ""))
             f.write("\n")
             
+            # 写入物品栏物品统计（仅深度扫描）
+            if self.item_stats:
+                f.write("物品栏物品统计:\n")
+                write_top_stats(f, self.item_stats, annotate=lambda item_id: (
+                    " (可能有问题)" if is_problematic_id(item_id, self.problematic_item_types) else ""))
+                f.write("\n")
+            
             # 写入问题区块信息
-            if self.chunks_with_issues:
-                f.write(f"发现 {len(self.chunks_with_issues)} 个可能存在升级问题的区块:\n")
-                for i, chunk in enumerate(self.chunks_with_issues[:100]):  # 限制显示100个
-                    f.write(f"  {i+1}. 文件: {chunk['file']}, 坐标: {chunk['coords']}\n")
+            if self.issue_count:
+                f.write(f"发现 {self.issue_count} 个可能存在升级问题的区块:\n")
+                for i, chunk in enumerate(self._issue_writer.preview[:REPORT_TOP_N]):  # 限制显示100个
+                    f.write(f"  {i+1}. 维度: {chunk['dimension']}, 文件: {chunk['file']}, 坐标: {chunk['coords']}\n")
                     for issue in chunk['issues']:
                         f.write(f"     - {issue}\n")
                 
-                if len(self.chunks_with_issues) > 100:
-                    f.write(f"  ... 还有 {len(self.chunks_with_issues) - 100} 个区块 (查看JSON文件获取完整列表)\n")
+                if self.issue_count > REPORT_TOP_N:
+                    f.write(f"  ... 还有 {self.issue_count - REPORT_TOP_N} 个区块 (查看JSON文件获取完整列表)\n")
             else:
                 f.write("未发现可能存在升级问题的区块\n")
         
@@ -175,10 +378,11 @@ class MinecraftSaveUpgradeHelper:
             f.write("   可以简单地复制整个文件夹，或使用压缩软件创建归档。\n\n")
             
             f.write("2. 问题区块处理建议\n")
-            if self.chunks_with_issues:
-                f.write(f"   发现 {len(self.chunks_with_issues)} 个可能有问题的区块。建议在升级前：\n")
+            if self.issue_count:
+                f.write(f"   发现 {self.issue_count} 个可能有问题的区块。建议在升级前：\n")
                 f.write("   - 访问这些区域并移除有问题的实体/方块\n")
-                f.write("   - 或者使用MCEdit等工具删除这些区块，让游戏重新生成\n")
+                f.write("   - 或者使用mc_chunk_pruner.py根据本次的JSON报告批量删除这些区块，让游戏重新生成\n")
+                f.write("     (python mc_cli.py prune 默认只预演，检查prune_results/prune_report.json后加--apply执行)\n\n")
             else:
                 f.write("   未发现明显问题区块，正常升级即可。\n\n")
             
@@ -195,46 +399,11 @@ class MinecraftSaveUpgradeHelper:
         print(f"备份建议已保存到 {backup_file}")
 
 
-def main():
-    """主函数"""
-    # 定义存档目录
-    save_dir = "save_world"
-    output_dir = "upgrade_analysis"
-    
-    # 创建升级助手
-    upgrade_helper = MinecraftSaveUpgradeHelper(save_dir, output_dir)
-    
-    # 设置可能在1.7.10升级到新版本时有问题的实体和方块实体
-    problematic_entities = [
-        "Minecart",  # 矿车可能会有变化
-        "Boat",      # 船的机制有变化
-        "ItemFrame", # 物品展示框的一些属性变化
-        "Vehicle",   # 模组添加的交通工具
-        "IC2.",      # IC2模组实体
-        "BambooMod" # 模组实体
-    ]
-    
-    problematic_tile_entities = [
-        "RCHiddenTile",  # 铁路工艺模组的方块
-        "CF-Wall",       # 模组方块
-        "BambooMultiBlock", # 模组复杂方块
-        "IC2NC",         # IC2模组方块
-        "Tile",          # 许多模组方块前缀
-        "TileArcaneLamp" # 神秘时代模组方块
-    ]
-    
-    upgrade_helper.set_problematic_entities(problematic_entities)
-    upgrade_helper.set_problematic_tile_entities(problematic_tile_entities)
-    
-    # 分析存档
-    print("开始分析存档以准备升级...")
-    upgrade_helper.analyze_save(max_files=5)  # 限制分析前5个区域文件，设为None则分析全部
-    
-    # 生成备份建议
-    upgrade_helper.recommend_backup_strategy()
-    
-    print("\n分析完成！请查看upgrade_analysis目录中的报告。")
+def main(argv=None):
+    """主函数，参数与 mc_cli.py upgrade-check 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["upgrade-check"] + (sys.argv[1:] if argv is None else list(argv)))
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
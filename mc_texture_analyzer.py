@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+方块贴图与渲染类型分析
+
+把方块提取结果（mc_block_extractor.py 输出的 *_block_stats.json）中的方块统计
+与 mc_block_parser.py 生成的 blocks_data.json 关联，统计每个区域文件中
+各贴图、各渲染类型（standard_block / directional_block / custom_render）的方块数量，
+找出数量最多、最影响客户端帧数的 custom_render 方块。
+
+关联通过预先构建的"方块ID → 贴图编号"numpy数组完成：每个区域文件先把方块统计
+汇总成按方块ID索引的直方图，再用np.bincount一次性得到贴图和渲染类型的计数，
+不需要逐个方块查表。只读取每个区域文件很小的方块统计文件，不载入包含每个方块位置的 *_blocks.json
+（只有旧版本提取结果没有统计文件时才回退读取完整结果）。
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from mc_report_writer import write_json, write_top_stats, top_items
+
+# 方块ID上限（1.7.10 - 1.12.2的Blocks加Add最多12位）
+MAX_BLOCK_ID = 4096
+
+# 渲染类型，blocks_data.json中没有的方块ID归为unknown
+RENDER_TYPES = ("standard_block", "directional_block", "custom_render", "unknown")
+UNKNOWN_RENDER_TYPE = RENDER_TYPES.index("unknown")
+CUSTOM_RENDER = RENDER_TYPES.index("custom_render")
+
+# 方块的6个面
+FACE_COUNT = 6
+
+# 提取结果中的方块统计文件和完整结果文件的后缀
+STATS_SUFFIX = "_block_stats.json"
+BLOCKS_SUFFIX = "_blocks.json"
+
+
+class TextureTable:
+    """
+    blocks_data.json的数组形式
+    face_textures[方块ID, 面]为贴图编号，没有贴图的面为no_texture；
+    render_types[方块ID]为渲染类型在RENDER_TYPES中的下标
+    """
+
+    def __init__(self, blocks):
+        self.texture_names = []
+        texture_index = {}
+        self.registry_names = {}
+
+        # 编号等于贴图数量的位置留给"没有贴图"，统计后直接丢弃
+        face_textures = [[None] * FACE_COUNT for _ in range(MAX_BLOCK_ID)]
+        self.render_types = np.full(MAX_BLOCK_ID, UNKNOWN_RENDER_TYPE, dtype=np.int8)
+
+        for block in blocks:
+            block_id = block.get("block_id")
+            if block_id is None or not 0 <= block_id < MAX_BLOCK_ID:
+                continue
+            self.registry_names[block_id] = block.get("registry_name") or str(block_id)
+            render_type = block.get("texture_type")
+            if render_type in RENDER_TYPES:
+                self.render_types[block_id] = RENDER_TYPES.index(render_type)
+
+            textures = block.get("textures") or {}
+            for face in range(FACE_COUNT):
+                name = textures.get(f"face_{face}")
+                if name is None:
+                    continue
+                if name not in texture_index:
+                    texture_index[name] = len(self.texture_names)
+                    self.texture_names.append(name)
+                face_textures[block_id][face] = texture_index[name]
+
+        self.no_texture = len(self.texture_names)
+        self.face_textures = np.array(
+            [[self.no_texture if index is None else index for index in faces] for faces in face_textures],
+            dtype=np.int32
+        )
+        # 展开后的贴图编号，与np.repeat(直方图, 6)一一对应
+        self._flat_textures = self.face_textures.ravel()
+
+    @classmethod
+    def load(cls, blocks_data_file):
+        """读取mc_block_parser.py生成的blocks_data.json"""
+        with open(blocks_data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get("blocks", []))
+
+    def block_name(self, block_id):
+        """返回方块的注册名，未知方块返回ID"""
+        return self.registry_names.get(block_id, f"未知方块 {block_id}")
+
+    def join(self, histogram):
+        """
+        把按方块ID索引的直方图换算为贴图和渲染类型的计数
+
+        返回(贴图面数数组, 渲染类型方块数数组)，贴图按方块的每个面计数
+        """
+        texture_counts = np.bincount(self._flat_textures, weights=np.repeat(histogram, FACE_COUNT),
+                                     minlength=self.no_texture + 1)[:self.no_texture]
+        render_counts = np.bincount(self.render_types, weights=histogram, minlength=len(RENDER_TYPES))
+        return texture_counts, render_counts
+
+
+def block_histogram(block_stats):
+    """
+    把提取结果中的{"方块ID:数据值": 数量}汇总为按方块ID索引的直方图
+
+    贴图表只区分方块ID，不同数据值的数量合并；超出MAX_BLOCK_ID的ID忽略
+    """
+    if not block_stats:
+        return np.zeros(MAX_BLOCK_ID, dtype=np.int64)
+    ids = np.fromiter((int(key.split(":", 1)[0]) for key in block_stats), dtype=np.int64,
+                      count=len(block_stats))
+    counts = np.fromiter(block_stats.values(), dtype=np.int64, count=len(block_stats))
+    valid = (ids >= 0) & (ids < MAX_BLOCK_ID)
+    return np.bincount(ids[valid], weights=counts[valid], minlength=MAX_BLOCK_ID).astype(np.int64)
+
+
+def top_indices(counts, n):
+    """返回计数最大的前n个非零下标（按计数从大到小）"""
+    nonzero = np.flatnonzero(counts)
+    if len(nonzero) > n:
+        nonzero = nonzero[np.argpartition(counts[nonzero], -n)[-n:]]
+    return nonzero[np.argsort(counts[nonzero], kind="stable")[::-1]]
+
+
+class MCTextureAnalyzer:
+    """
+    方块贴图分析器
+    读取方块提取结果目录中的所有 *_block_stats.json，按区域文件和整个存档统计贴图与渲染类型
+    """
+
+    def __init__(self, blocks_data_file, output_dir="texture_analysis", top_n=10):
+        """top_n为每个区域文件报告的贴图和custom_render方块数量"""
+        self.blocks_data_file = blocks_data_file
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.table = None
+
+        # 分析结果
+        self.regions = []
+        self.error_count = 0
+        self.world_histogram = np.zeros(MAX_BLOCK_ID, dtype=np.int64)
+        self.join_time = 0.0
+        self.load_time = 0.0
+
+        # 确保输出目录存在
+        os.makedirs(output_dir, exist_ok=True)
+
+    def analyze(self, extract_dir):
+        """分析extract_dir（及其维度子目录）中的所有方块提取结果"""
+        try:
+            self.table = TextureTable.load(self.blocks_data_file)
+        except (OSError, ValueError) as e:
+            print(f"读取方块贴图数据 {self.blocks_data_file} 时出错: {e}")
+            return False
+
+        # 优先使用方块统计文件，旧版本的提取结果只有完整的*_blocks.json
+        result_files = []
+        legacy_files = 0
+        for root, _dirs, files in os.walk(extract_dir):
+            names = set(files)
+            for file_name in sorted(files):
+                if file_name.endswith(STATS_SUFFIX):
+                    result_files.append(os.path.join(root, file_name))
+                elif (file_name.endswith(BLOCKS_SUFFIX)
+                      and file_name[:-len(BLOCKS_SUFFIX)] + STATS_SUFFIX not in names):
+                    result_files.append(os.path.join(root, file_name))
+                    legacy_files += 1
+
+        if not result_files:
+            print(f"在 {extract_dir} 中找不到方块提取结果 (*{STATS_SUFFIX})，请先运行 mc_cli.py extract")
+            return False
+        if legacy_files:
+            print(f"注意: {legacy_files} 个提取结果没有方块统计文件，需要载入完整结果，"
+                  f"重新运行 mc_cli.py extract 可以加快分析")
+
+        print(f"载入 {len(self.table.registry_names)} 个方块的贴图数据，"
+              f"共 {self.table.no_texture} 种贴图；分析 {len(result_files)} 个提取结果...")
+
+        for path in sorted(result_files):
+            dimension = os.path.relpath(os.path.dirname(path), extract_dir)
+            start_time = time.perf_counter()
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取提取结果 {path} 时出错: {e}")
+                self.error_count += 1
+                continue
+            self.load_time += time.perf_counter() - start_time
+
+            self.analyze_region(results.get("file_name", os.path.basename(path)),
+                                "" if dimension == os.curdir else dimension,
+                                results.get("block_stats", {}))
+
+        region_count = max(len(self.regions), 1)
+        print(f"读取提取结果耗时: {self.load_time * 1000:.1f} 毫秒，贴图关联耗时: {self.join_time * 1000:.1f} 毫秒 "
+              f"(平均每个区域文件 {(self.load_time + self.join_time) * 1000 / region_count:.2f} 毫秒)")
+        return True
+
+    def analyze_region(self, file_name, dimension, block_stats):
+        """统计单个区域文件的贴图和渲染类型"""
+        start_time = time.perf_counter()
+        histogram = block_histogram(block_stats)
+        texture_counts, render_counts = self.table.join(histogram)
+        custom_counts = np.where(self.table.render_types == CUSTOM_RENDER, histogram, 0)
+        self.join_time += time.perf_counter() - start_time
+
+        self.world_histogram += histogram
+        total_blocks = int(histogram.sum())
+        self.regions.append({
+            "dimension": dimension,
+            "file": file_name,
+            "total_blocks": total_blocks,
+            "render_types": {RENDER_TYPES[i]: int(count) for i, count in enumerate(render_counts)},
+            "custom_render_ratio": float(render_counts[CUSTOM_RENDER] / total_blocks) if total_blocks else 0.0,
+            "top_textures": {self.table.texture_names[i]: int(texture_counts[i])
+                             for i in top_indices(texture_counts, self.top_n)},
+            "top_custom_render": {self.table.block_name(int(i)): int(custom_counts[i])
+                                  for i in top_indices(custom_counts, self.top_n)}
+        })
+
+    def get_results(self):
+        """获取整个存档的统计结果"""
+        texture_counts, render_counts = self.table.join(self.world_histogram)
+        custom_counts = np.where(self.table.render_types == CUSTOM_RENDER, self.world_histogram, 0)
+        unknown_counts = np.where(self.table.render_types == UNKNOWN_RENDER_TYPE, self.world_histogram, 0)
+
+        return {
+            "blocks_data_file": self.blocks_data_file,
+            "analyzed_regions": len(self.regions),
+            "error_count": self.error_count,
+            "total_blocks": int(self.world_histogram.sum()),
+            "render_types": {RENDER_TYPES[i]: int(count) for i, count in enumerate(render_counts)},
+            "texture_stats": {self.table.texture_names[i]: int(texture_counts[i])
+                              for i in np.flatnonzero(texture_counts)},
+            "custom_render_stats": {self.table.block_name(int(i)): int(custom_counts[i])
+                                    for i in np.flatnonzero(custom_counts)},
+            "unknown_block_stats": {str(int(i)): int(unknown_counts[i]) for i in np.flatnonzero(unknown_counts)},
+            "regions": self.regions
+        }
+
+    def generate_report(self, pretty=False):
+        """生成贴图分析报告，pretty为True时JSON报告使用缩进格式"""
+        report_file = os.path.join(self.output_dir, "texture_report.txt")
+        json_file = os.path.join(self.output_dir, "texture_report.json")
+
+        report_data = self.get_results()
+        report_data["analysis_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 保存JSON报告
+        write_json(json_file, report_data, pretty)
+
+        # custom_render方块最多的区域文件最可能拖慢客户端
+        hotspots = sorted((region for region in self.regions if region["render_types"]["custom_render"]),
+                          key=lambda region: region["render_types"]["custom_render"], reverse=True)
+
+        # 保存文本报告
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write("Minecraft方块贴图分析报告\n")
+            f.write("======================\n\n")
+            f.write(f"贴图数据: {self.blocks_data_file}\n")
+            f.write(f"分析时间: {report_data['analysis_time']}\n")
+            f.write(f"区域文件数: {len(self.regions)}\n")
+            f.write(f"错误次数: {self.error_count}\n")
+            f.write(f"总方块数: {report_data['total_blocks']}\n\n")
+
+            f.write("渲染类型统计:\n")
+            total_blocks = max(report_data["total_blocks"], 1)
+            for render_type, count in report_data["render_types"].items():
+                f.write(f"  {render_type}: {count} ({count / total_blocks:.2%})\n")
+            f.write("\n")
+
+            if report_data["custom_render_stats"]:
+                f.write("custom_render方块统计 (最影响客户端帧数):\n")
+                write_top_stats(f, report_data["custom_render_stats"])
+            else:
+                f.write("未发现custom_render方块\n")
+            f.write("\n")
+
+            f.write("贴图统计 (按方块面数):\n")
+            write_top_stats(f, report_data["texture_stats"])
+            f.write("\n")
+
+            if report_data["unknown_block_stats"]:
+                f.write("贴图数据中没有的方块ID:\n")
+                write_top_stats(f, report_data["unknown_block_stats"])
+                f.write("\n")
+
+            if hotspots:
+                f.write(f"custom_render方块最多的区域文件 (前{self.top_n}个):\n")
+            for region in hotspots[:self.top_n]:
+                name = os.path.join(region["dimension"], region["file"]) if region["dimension"] else region["file"]
+                f.write(f"  {name}: {region['render_types']['custom_render']} 个 "
+                        f"({region['custom_render_ratio']:.2%})\n")
+                for block_name, count in top_items(region["top_custom_render"], 3):
+                    f.write(f"     - {block_name}: {count}\n")
+
+        print(f"贴图分析报告已保存到 {report_file} 和 {json_file}")
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py textures 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["textures"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
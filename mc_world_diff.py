@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import hashlib
+import amulet_nbt as nbt
+from io import BytesIO
+from collections import defaultdict
+
+from mc_region_reader import (
+    parse_region_coords, read_region_header, read_chunk_payload,
+    decompress_chunk, list_region_files
+)
+from mc_report_writer import write_json, REPORT_TOP_N
+
+class MCWorldDiff:
+    """
+    比较两个Minecraft存档（或同一存档的两个快照）在区块粒度上的差异
+    先比较区域文件头部（时间戳、扇区数），再比较区块原始数据的哈希，
+    只有哈希不同的区块才会被完整解码，输出每个区块新增、删除和变化的实体与方块实体
+    """
+
+    def __init__(self, old_save_dir, new_save_dir, output_dir="world_diff", trust_timestamps=True):
+        """
+        初始化比较器
+
+        trust_timestamps为True时，头部时间戳和扇区数都相同的区块直接视为未变化，
+        不再读取区块数据；存档被修改时间戳的工具处理过时可设为False
+        """
+        self.old_save_dir = old_save_dir
+        self.new_save_dir = new_save_dir
+        self.output_dir = output_dir
+        self.trust_timestamps = trust_timestamps
+
+        # 比较结果
+        self.chunk_diffs = []
+        self.error_count = 0
+        self.stats = defaultdict(int)
+
+    def compare_worlds(self, max_files=None):
+        """比较两个存档region目录中的所有区域文件"""
+        old_region_dir = os.path.join(self.old_save_dir, "region")
+        new_region_dir = os.path.join(self.new_save_dir, "region")
+
+        if not os.path.exists(old_region_dir) and not os.path.exists(new_region_dir):
+            print(f"找不到region目录: {old_region_dir} 和 {new_region_dir}")
+            return False
+
+        mca_files = sorted(set(list_region_files(old_region_dir)) | set(list_region_files(new_region_dir)))
+
+        if not mca_files:
+            print("两个存档中都找不到mca文件")
+            return False
+
+        # 限制比较文件数量（如果指定）
+        if max_files and max_files > 0:
+            mca_files = mca_files[:max_files]
+
+        total_files = len(mca_files)
+        print(f"找到 {total_files} 个区域文件，开始比较...")
+
+        for i, mca_file in enumerate(mca_files):
+            print(f"比较文件 {i+1}/{total_files}: {mca_file}")
+            self.compare_region(
+                os.path.join(old_region_dir, mca_file),
+                os.path.join(new_region_dir, mca_file)
+            )
+
+        return True
+
+    def compare_region(self, old_mca_path, new_mca_path):
+        """比较同名的两个区域文件，任意一方不存在时视为空区域"""
+        file_name = os.path.basename(new_mca_path)
+        region_x, region_z = parse_region_coords(file_name)
+        self.stats["regions_compared"] += 1
+
+        old_file = open(old_mca_path, 'rb') if os.path.exists(old_mca_path) else None
+        new_file = open(new_mca_path, 'rb') if os.path.exists(new_mca_path) else None
+        try:
+            old_entries = {}
+            new_entries = {}
+            if old_file is not None:
+                old_entries = {e.chunk_index: e for e in read_region_header(old_file, region_x, region_z)}
+            if new_file is not None:
+                new_entries = {e.chunk_index: e for e in read_region_header(new_file, region_x, region_z)}
+
+            for chunk_index in sorted(set(old_entries) | set(new_entries)):
+                old_entry = old_entries.get(chunk_index)
+                new_entry = new_entries.get(chunk_index)
+                entry = new_entry or old_entry
+                try:
+                    self._compare_chunk(file_name, old_file, old_entry, new_file, new_entry)
+                except Exception as e:
+                    self.error_count += 1
+                    print(f"比较区块 ({entry.chunk_x}, {entry.chunk_z}) 时出错: {str(e)}")
+        except Exception as e:
+            self.error_count += 1
+            print(f"比较区域文件 {file_name} 时出错: {str(e)}")
+        finally:
+            if old_file is not None:
+                old_file.close()
+            if new_file is not None:
+                new_file.close()
+
+    def _compare_chunk(self, file_name, old_file, old_entry, new_file, new_entry):
+        """按头部 -> 哈希 -> 解码的顺序比较单个区块"""
+        if old_entry is None:
+            self.stats["chunks_added"] += 1
+            new_entities, new_tiles = self._decode_entities(*read_chunk_payload(new_file, new_entry))
+            self._record_diff(file_name, new_entry, "added", {}, new_entities, {}, new_tiles)
+            return
+
+        if new_entry is None:
+            self.stats["chunks_removed"] += 1
+            old_entities, old_tiles = self._decode_entities(*read_chunk_payload(old_file, old_entry))
+            self._record_diff(file_name, old_entry, "removed", old_entities, {}, old_tiles, {})
+            return
+
+        # 第一层：头部比较
+        if (self.trust_timestamps
+                and old_entry.timestamp == new_entry.timestamp
+                and old_entry.sector_count == new_entry.sector_count):
+            self.stats["chunks_unchanged_header"] += 1
+            return
+
+        # 第二层：原始数据哈希比较
+        old_payload = read_chunk_payload(old_file, old_entry)
+        new_payload = read_chunk_payload(new_file, new_entry)
+        if self._payload_hash(*old_payload) == self._payload_hash(*new_payload):
+            self.stats["chunks_unchanged_hash"] += 1
+            return
+
+        # 第三层：完整解码比较
+        self.stats["chunks_decoded"] += 1
+        old_entities, old_tiles = self._decode_entities(*old_payload)
+        new_entities, new_tiles = self._decode_entities(*new_payload)
+        if not self._record_diff(file_name, new_entry, "changed",
+                                 old_entities, new_entities, old_tiles, new_tiles):
+            # 数据不同但实体和方块实体未变化（例如仅方块或光照变化）
+            self.stats["chunks_unchanged_entities"] += 1
+
+    @staticmethod
+    def _payload_hash(compression_type, compressed_data):
+        """计算区块原始数据的哈希"""
+        digest = hashlib.blake2b(compressed_data, digest_size=16)
+        digest.update(bytes([compression_type or 0]))
+        return digest.digest()
+
+    @staticmethod
+    def _entity_key(entity, entity_id, position):
+        """生成实体的标识：优先使用UUID，没有UUID时使用ID和位置"""
+        if "UUIDMost" in entity and "UUIDLeast" in entity:
+            return f"uuid:{int(entity['UUIDMost'])}:{int(entity['UUIDLeast'])}"
+        if "UUID" in entity:
+            return "uuid:" + ":".join(str(int(v)) for v in entity["UUID"])
+        return f"{entity_id}@{position}"
+
+    def _decode_entities(self, compression_type, compressed_data):
+        """
+        解码区块并提取实体和方块实体
+
+        返回两个字典：实体标识 -> (实体信息, 标签)，方块位置 -> (方块实体信息, 标签)
+        """
+        entities = {}
+        tile_entities = {}
+        if compression_type is None:
+            return entities, tile_entities
+
+        data = decompress_chunk(compression_type, compressed_data)
+        nbt_data = nbt.load(BytesIO(data))
+        level = nbt_data.tag["Level"] if "Level" in nbt_data.tag else nbt_data.tag
+
+        if "Entities" in level:
+            for entity in level["Entities"]:
+                if "id" not in entity:
+                    continue
+                entity_info = {"id": str(entity["id"])}
+                if "Pos" in entity and len(entity["Pos"]) >= 3:
+                    pos = entity["Pos"]
+                    entity_info["position"] = [float(pos[0]), float(pos[1]), float(pos[2])]
+                key = self._entity_key(entity, entity_info["id"], entity_info.get("position"))
+                entities[key] = (entity_info, entity)
+
+        if "TileEntities" in level:
+            for tile_entity in level["TileEntities"]:
+                if "id" not in tile_entity or not all(k in tile_entity for k in ["x", "y", "z"]):
+                    continue
+                position = (int(tile_entity["x"]), int(tile_entity["y"]), int(tile_entity["z"]))
+                tile_info = {"id": str(tile_entity["id"]), "position": list(position)}
+                tile_entities[position] = (tile_info, tile_entity)
+
+        return entities, tile_entities
+
+    @staticmethod
+    def _diff_sets(old_items, new_items, is_changed):
+        """比较两组以标识为键的对象，返回新增、删除和变化的列表"""
+        added = [new_items[k][0] for k in new_items if k not in old_items]
+        removed = [old_items[k][0] for k in old_items if k not in new_items]
+        changed = []
+        for key in old_items:
+            if key in new_items and is_changed(old_items[key], new_items[key]):
+                changed.append({"old": old_items[key][0], "new": new_items[key][0]})
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def _record_diff(self, file_name, entry, status, old_entities, new_entities, old_tiles, new_tiles):
+        """记录区块差异，没有任何实体或方块实体变化的changed区块不记录，返回是否记录"""
+        # 实体的其他属性（如年龄、血量）几乎总在变化，只比较ID和位置
+        entity_diff = self._diff_sets(old_entities, new_entities, lambda a, b: a[0] != b[0])
+        # 方块实体比较完整标签，容器内容变化也会被记录
+        tile_diff = self._diff_sets(old_tiles, new_tiles, lambda a, b: a[0] != b[0] or a[1] != b[1])
+
+        has_changes = any(entity_diff.values()) or any(tile_diff.values())
+        if status == "changed" and not has_changes:
+            return False
+
+        if status == "changed":
+            self.stats["chunks_changed"] += 1
+        self.chunk_diffs.append({
+            "file": file_name,
+            "coords": [entry.chunk_x, entry.chunk_z],
+            "status": status,
+            "entities": entity_diff,
+            "tile_entities": tile_diff
+        })
+        return True
+
+    def get_results(self):
+        """获取比较结果"""
+        return {
+            "old_save_directory": self.old_save_dir,
+            "new_save_directory": self.new_save_dir,
+            "error_count": self.error_count,
+            "stats": dict(self.stats),
+            "chunks": self.chunk_diffs
+        }
+
+    def save_report(self, output_txt=None, output_json=None, pretty=False):
+        """保存比较结果到文件，pretty为True时JSON报告使用缩进格式"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if output_txt is None:
+            output_txt = os.path.join(self.output_dir, "world_diff_report.txt")
+
+        if output_json is None:
+            output_json = os.path.join(self.output_dir, "world_diff_report.json")
+
+        results = self.get_results()
+        results["analysis_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 保存JSON报告
+        write_json(output_json, results, pretty)
+
+        # 保存文本报告
+        with open(output_txt, 'w', encoding='utf-8') as f:
+            f.write("Minecraft存档差异报告\n")
+            f.write("==================\n\n")
+            f.write(f"旧存档: {self.old_save_dir}\n")
+            f.write(f"新存档: {self.new_save_dir}\n")
+            f.write(f"比较时间: {results['analysis_time']}\n")
+            f.write(f"错误次数: {self.error_count}\n\n")
+
+            f.write("统计:\n")
+            f.write(f"  比较区域文件数: {self.stats['regions_compared']}\n")
+            f.write(f"  新增区块: {self.stats['chunks_added']}\n")
+            f.write(f"  删除区块: {self.stats['chunks_removed']}\n")
+            f.write(f"  变化区块: {self.stats['chunks_changed']}\n")
+            f.write(f"  头部相同跳过: {self.stats['chunks_unchanged_header']}\n")
+            f.write(f"  哈希相同跳过: {self.stats['chunks_unchanged_hash']}\n")
+            f.write(f"  完整解码: {self.stats['chunks_decoded']}\n\n")
+
+            if self.chunk_diffs:
+                f.write(f"区块差异 (显示前100个):\n")
+                for chunk in self.chunk_diffs[:REPORT_TOP_N]:
+                    f.write(f"  文件: {chunk['file']}, 坐标: {chunk['coords']}, 状态: {chunk['status']}\n")
+                    for label, diff in (("实体", chunk["entities"]), ("方块实体", chunk["tile_entities"])):
+                        if diff["added"]:
+                            f.write(f"     - 新增{label}: {len(diff['added'])}\n")
+                        if diff["removed"]:
+                            f.write(f"     - 删除{label}: {len(diff['removed'])}\n")
+                        if diff["changed"]:
+                            f.write(f"     - 变化{label}: {len(diff['changed'])}\n")
+
+                if len(self.chunk_diffs) > REPORT_TOP_N:
+                    f.write(f"  ... 还有 {len(self.chunk_diffs) - REPORT_TOP_N} 个区块 (查看JSON文件获取完整列表)\n")
+            else:
+                f.write("未发现区块差异\n")
+
+        print(f"差异报告已保存到 {output_txt} 和 {output_json}")
+        return output_txt, output_json
+
+
+def main(argv=None):
+    """主函数，参数与 mc_cli.py diff 相同"""
+    from mc_cli import main as cli_main
+    return cli_main(["diff"] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Minecraft存档维度遍历工具
+
+查找存档中所有维度的region目录（主世界region、下界DIM-1、末地DIM1，以及Mystcraft等模组添加的DIM<N>），
+把其中的区域文件放进同一个任务队列，按文件大小从大到小调度以均衡各工作进程的负载，
+结果按维度分组返回。
+"""
+
+import os
+import re
+from collections import namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from mc_region_reader import list_region_files
+from mc_progress import ProgressReporter, create_shared_counter, install_counter, current_counter, report_error
+
+# 主世界的维度名称
+OVERWORLD = "overworld"
+
+# 一个区域文件任务
+RegionTask = namedtuple("RegionTask", ["dimension", "region_dir", "file_name", "path", "size"])
+
+DIMENSION_PATTERN = re.compile(r'^DIM(-?\d+)$')
+
+
+def dimension_sort_key(dimension):
+    """主世界排在最前，DIM<N>按编号排序，其他目录按名称排序"""
+    if dimension == OVERWORLD:
+        return (0, 0, "")
+    match = DIMENSION_PATTERN.match(dimension)
+    if match:
+        return (1, int(match.group(1)), "")
+    return (2, 0, dimension)
+
+
+def find_dimension_region_dirs(save_dir):
+    """
+    查找存档中所有包含区域文件的维度目录
+
+    返回按维度排序的[(维度名称, region目录)]列表，主世界名称为"overworld"，
+    其他维度使用其所在的目录名（如DIM-1、DIM1、DIM7）
+    """
+    dimensions = []
+
+    overworld_region_dir = os.path.join(save_dir, "region")
+    if list_region_files(overworld_region_dir):
+        dimensions.append((OVERWORLD, overworld_region_dir))
+
+    if os.path.isdir(save_dir):
+        for name in os.listdir(save_dir):
+            region_dir = os.path.join(save_dir, name, "region")
+            if list_region_files(region_dir):
+                dimensions.append((name, region_dir))
+
+    dimensions.sort(key=lambda item: dimension_sort_key(item[0]))
+    return dimensions
+
+
+class WorldWalker:
+    """
+    存档维度遍历器
+    将所有维度的区域文件作为一个任务队列调度，结果按维度分组
+    """
+
+    def __init__(self, save_dir, dimensions=None, chunk_filter=None, show_progress=True):
+        """
+        初始化遍历器
+
+        dimensions为要包含的维度名称列表，None表示全部维度；
+        chunk_filter为ChunkFilter时只根据文件名选出可能包含所需区块的区域文件，None表示不限制；
+        show_progress为False时不输出进度和每个文件的完成信息
+        """
+        self.save_dir = save_dir
+        self.dimensions = dimensions
+        self.chunk_filter = chunk_filter
+        self.show_progress = show_progress
+        self.error_count = 0
+
+    def find_dimensions(self):
+        """返回需要遍历的[(维度名称, region目录)]列表"""
+        found = find_dimension_region_dirs(self.save_dir)
+        if self.dimensions is None:
+            return found
+        return [(name, region_dir) for name, region_dir in found if name in self.dimensions]
+
+    def build_work_queue(self, max_files=None):
+        """
+        构建任务队列，按文件大小从大到小排列
+
+        大文件先调度，避免最后只剩一个大文件拖慢整体进度；
+        max_files限制的是整个队列的文件数
+        """
+        tasks = []
+        for dimension, region_dir in self.find_dimensions():
+            # 区块列表中的问题区块只对其所在的维度生效
+            chunk_filter = self.chunk_filter.for_dimension(dimension) if self.chunk_filter is not None else None
+            for file_name in list_region_files(region_dir):
+                if chunk_filter is not None and not chunk_filter.includes_region_file(file_name):
+                    continue
+                path = os.path.join(region_dir, file_name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                tasks.append(RegionTask(dimension, region_dir, file_name, path, size))
+
+        tasks.sort(key=lambda task: task.size, reverse=True)
+        if max_files and max_files > 0:
+            tasks = tasks[:max_files]
+        return tasks
+
+    def run(self, task_func, workers=1, tasks=None, max_files=None, on_result=None):
+        """
+        对队列中的每个区域文件执行task_func
+
+        tasks为None时使用build_work_queue(max_files)构建的队列；
+        task_func接收RegionTask并返回结果，workers大于1时在进程池中执行，
+        此时task_func必须是模块级函数。on_result(task, result)在主进程中按完成顺序调用；
+        未提供on_result时返回{维度名称: {文件名: 结果}}。on_result抛出的异常与task_func一样计为该文件的错误。
+        所有进程共享一个进度计数器，错误消息汇总到主进程统一限流输出；
+        show_progress为True时主进程还定期输出已处理字节、区块/秒、预计剩余时间和错误总数
+        """
+        if tasks is None:
+            tasks = self.build_work_queue(max_files)
+        partitions = defaultdict(dict)
+        total_tasks = len(tasks)
+
+        shared_counter = create_shared_counter()
+        install_counter(*shared_counter)
+        reporter = ProgressReporter(current_counter(), sum(task.size for task in tasks), total_tasks,
+                                    show_progress=self.show_progress)
+        reporter.start()
+
+        def handle(index, task, result):
+            reporter.file_done()
+            if self.show_progress:
+                print(f"完成 {index}/{total_tasks}: [{task.dimension}] {task.file_name}")
+            # 主进程中合并结果出错（如区域文件在扫描中途被删除、磁盘已满）只影响这一个文件
+            try:
+                if on_result is not None:
+                    on_result(task, result)
+                else:
+                    partitions[task.dimension][task.file_name] = result
+            except Exception as e:
+                handle_error(task, e)
+
+        def handle_error(task, error):
+            self.error_count += 1
+            report_error("处理区域文件时出错", f"处理 [{task.dimension}] {task.file_name} 时出错: {str(error)}")
+
+        try:
+            if workers is None or workers <= 1:
+                for i, task in enumerate(tasks):
+                    try:
+                        result = task_func(task)
+                    except Exception as e:
+                        handle_error(task, e)
+                        continue
+                    handle(i + 1, task, result)
+            else:
+                # 工作进程启动时安装共享计数器
+                with ProcessPoolExecutor(max_workers=workers, initializer=install_counter,
+                                         initargs=shared_counter) as executor:
+                    # 任务按大小顺序提交，进程池按提交顺序取任务
+                    futures = {executor.submit(task_func, task): task for task in tasks}
+                    for i, future in enumerate(as_completed(futures)):
+                        task = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            handle_error(task, e)
+                            continue
+                        handle(i + 1, task, result)
+        finally:
+            # 先写出主进程计数器中尚未写入的错误（如handle_error记录的），再输出最终统计
+            reporter.stop()
+            install_counter(None)
+
+        return dict(partitions)